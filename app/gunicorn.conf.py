@@ -0,0 +1,23 @@
+# Gunicorn settings for the production entry point (app/wsgi.py).
+# Each worker process loads its own CentralAgent; threaded workers let one process serve
+# several /chat requests at once while the tools wait on network I/O.
+import os
+import logging
+
+bind = os.getenv("BIND", "0.0.0.0:5001")
+# One process by default: Chroma is only safe with a single writer. To scale out, run this
+# writer for uploads and separate read-only instances (VECTOR_STORE_READ_ONLY=true) for chat;
+# see "Scaling out" in the README. Every instance with several workers needs
+# CONVERSATION_STORE_PATH, or each process keeps its own conversation history.
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+if workers > 1 and not os.getenv("CONVERSATION_STORE_PATH"):
+    logging.warning("WEB_CONCURRENCY > 1 without CONVERSATION_STORE_PATH: conversation history will differ between worker processes.")
+if workers > 1 and os.getenv("VECTOR_STORE_READ_ONLY", "false").lower() not in ("1", "true", "yes"):
+    logging.warning("WEB_CONCURRENCY > 1 on a writable instance: uploads in one worker process race with writes in the others.")
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+# Streaming /chat/stream responses and slow tools need more than the 30s default
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+keepalive = 5
+# Do not preload: each worker opens its own vector store client and HTTP connection pool
+preload_app = False
@@ -4,8 +4,11 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 # from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user # Removed login
 import os
+import json
+import uuid
+import queue
 import dotenv
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
 
@@ -35,6 +38,9 @@ if project_root not in sys.path:
 
 try:
     from chatbot_v3.src.central_agent import CentralAgent
+    from chatbot_v3.src.ingestion_queue import IngestionQueue
+    from chatbot_v3.src.metrics import METRICS
+    from chatbot_v3.src.conversation_store import ConversationStore
 except ImportError as e:
     print(f"Error importing CentralAgent: {e}")
     # Provide a fallback or raise an error if CentralAgent is critical
@@ -49,8 +55,10 @@ UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", 'uploads')
 # Remove redundant app initialization
 # app = Flask(__name__)
 # app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-# Initialize conversation history
-conversation_history = []
+# Initialize the per-session conversation store
+conversation_store = ConversationStore()
+# Cookie used to remember the session of clients that do not send a session_id
+SESSION_COOKIE = 'chat_session'
 
 # Initialize the CentralAgent (consider if it should be initialized per request or once)
 # For simplicity, initializing once here. If state needs to be reset, initialize per request.
@@ -61,6 +69,15 @@ except Exception as e:
     # Handle initialization error appropriately
     central_agent = None # Or raise an error
 
+# Uploads are ingested by background workers so request threads are never tied up
+ingestion_queue = IngestionQueue(central_agent.orchestrator) if central_agent else None
+
+def get_session_id():
+    """Returns the caller's session ID from the request body, header, query string or cookie."""
+    data = request.get_json(silent=True) or {}
+    return (data.get('session_id') or request.headers.get('X-Session-ID')
+            or request.args.get('session_id') or request.cookies.get(SESSION_COOKIE))
+
 @app.route('/')
 def index():
     """Serves the main HTML page."""
@@ -80,23 +97,53 @@ def upload():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
+    if not ingestion_queue:
+        return jsonify({'error': 'Chatbot agent not initialized'}), 500
+
     if file:
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         try:
             file.save(filepath)
-            # Add document to vector store
-            try:
-                central_agent.orchestrator.execute_tools(["VectorStore"], {"file_path": filepath, "add": True})
-            except Exception as e:
-                print(f"Error adding document to vector store: {e}")
-                return jsonify({'error': f'Error adding document to vector store: {e}'}), 500
-            return jsonify({'message': 'File uploaded and added to vector store successfully', 'filename': filename}), 200
         except Exception as e:
             return jsonify({'error': f'Error saving file: {e}'}), 500
+        # Queue the document for background ingestion into the vector store
+        try:
+            job = ingestion_queue.submit(filepath, source=filename)
+        except queue.Full:
+            return jsonify({'error': 'Ingestion queue is full, please retry later'}), 503
+        except Exception as e:
+            print(f"Error queueing document for ingestion: {e}")
+            return jsonify({'error': f'Error adding document to vector store: {e}'}), 500
+        if job['status'] == 'skipped':
+            return jsonify({'message': 'File already indexed, skipping ingestion', 'filename': filename, 'job': job}), 200
+        return jsonify({'message': 'File uploaded and queued for ingestion', 'filename': filename, 'job_id': job['job_id'], 'job': job}), 202
     else:
         return jsonify({'error': 'Unknown error'}), 500
 
+@app.route('/api/ingestion/jobs', methods=['GET'])
+def list_ingestion_jobs():
+    """Lists recent ingestion jobs, newest first."""
+    if not ingestion_queue:
+        return jsonify({"error": "Chatbot agent not initialized"}), 500
+    return jsonify({"jobs": ingestion_queue.list_jobs()}), 200
+
+@app.route('/api/ingestion/jobs/<job_id>', methods=['GET'])
+def get_ingestion_job(job_id):
+    """Reports the progress of an ingestion job."""
+    job = ingestion_queue.get_job(job_id) if ingestion_queue else None
+    if not job:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify({"job": job}), 200
+
+@app.route('/api/ingestion/jobs/<job_id>', methods=['DELETE'])
+def cancel_ingestion_job(job_id):
+    """Cancels a queued or running ingestion job."""
+    job = ingestion_queue.cancel(job_id) if ingestion_queue else None
+    if not job:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify({"job": job}), 200
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Handles chat requests."""
@@ -108,16 +155,26 @@ def chat():
         return jsonify({"error": "Missing 'query' in request body"}), 400
 
     user_query = data['query']
+    session_id = get_session_id() or uuid.uuid4().hex
+    # Clients can ask for a per-stage timing breakdown with {"timings": true} or ?timings=1
+    include_timings = bool(data.get('timings')) or request.args.get('timings') in ('1', 'true')
 
     try:
         # Process the query using the CentralAgent
-        response, sources = central_agent.process_query(user_query)
+        timings = {}
+        with METRICS.timed("chat_request", timings):
+            response, sources = central_agent.process_query(user_query, timings=timings)
         tools_used = central_agent.get_used_tools()
 
-        # Append to conversation history
-        conversation_history.append((user_query, response))
+        # Append to this session's conversation history; only the new turn is returned
+        turn = conversation_store.add_turn(session_id, user_query, response)
 
-        return jsonify({"response": response, "sources": sources, "history": conversation_history, "tools": tools_used})
+        result = {"response": response, "sources": sources, "tools": tools_used, "session_id": session_id, "turn": turn}
+        if include_timings:
+            result["timings"] = timings
+        http_response = jsonify(result)
+        http_response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+        return http_response
     except Exception as e:
         print(f"Error processing query: {e}")
         # Log the exception traceback for debugging
@@ -125,6 +182,58 @@ def chat():
         traceback.print_exc()
         return jsonify({"error": f"An error occurred: {e}"}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streams chat results as server-sent events, one per tool as it finishes, then the final response."""
+    if not central_agent:
+        return jsonify({"error": "Chatbot agent not initialized"}), 500
+
+    data = request.get_json()
+    if not data or 'query' not in data:
+        return jsonify({"error": "Missing 'query' in request body"}), 400
+
+    user_query = data['query']
+    session_id = get_session_id() or uuid.uuid4().hex
+
+    def generate():
+        try:
+            for event in central_agent.stream_query(user_query):
+                if event["event"] == "final":
+                    event["turn"] = conversation_store.add_turn(session_id, user_query, event["response"])
+                    event["session_id"] = session_id
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            print(f"Error streaming query: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': f'An error occurred: {e}'})}\n\n"
+
+    # Disable proxy buffering so each event reaches the browser as soon as it is written
+    http_response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    http_response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+    return http_response
+
+@app.route('/api/conversations/history', methods=['GET'])
+def get_conversation_history():
+    """Returns a page of the caller's conversation history, newest first.
+
+    Query parameters: limit (default 20, max 100) and before (turn ID cursor from next_before).
+    """
+    session_id = get_session_id()
+    if not session_id:
+        return jsonify({"turns": [], "next_before": None}), 200
+    try:
+        limit = min(int(request.args.get('limit', 20)), 100)
+        before = int(request.args['before']) if request.args.get('before') else None
+    except ValueError:
+        return jsonify({"error": "'limit' and 'before' must be integers"}), 400
+    turns, next_before = conversation_store.get_history(session_id, limit=limit, before=before)
+    return jsonify({"session_id": session_id, "turns": turns, "next_before": next_before}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Exposes pipeline latency, error, cache and in-flight metrics in Prometheus text format."""
+    return Response(METRICS.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/select_vector_store', methods=['POST'])
 def select_vector_store():
     """Handles vector store selection from the frontend."""
@@ -143,33 +252,39 @@ def select_vector_store():
 
 @app.route('/api/vector_store/documents', methods=['GET'])
 def get_vector_store_documents():
-    """Retrieves a list of documents from the vector store."""
+    """Returns a page of the vector store's document catalogue, newest first.
+
+    Query parameters: limit (default 50, max 500), cursor (from next_cursor), name (substring
+    of the file name), content_hash and since (Unix time of the earliest ingest to include).
+    """
     if not central_agent:
         return jsonify({"error": "Chatbot agent not initialized"}), 500
     try:
-        documents = central_agent.get_documents()
-        return jsonify({"documents": documents}), 200
+        limit = int(request.args.get('limit', 50))
+        since = float(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer and 'since' a number"}), 400
+    try:
+        page = central_agent.get_documents(limit=limit, cursor=request.args.get('cursor') or None,
+                                           name=request.args.get('name') or None,
+                                           content_hash=request.args.get('content_hash') or None, since=since)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error retrieving documents: {e}")
         return jsonify({"error": f"Error retrieving documents: {e}"}), 500
+    # "id" and "name" are what the document list in the UI shows
+    documents = [dict(document, id=document["doc_id"]) for document in page["documents"]]
+    return jsonify({"documents": documents, "next_cursor": page["next_cursor"]}), 200
 
 @app.route('/api/vector_store/documents/<doc_id>', methods=['DELETE'])
 def delete_vector_store_document(doc_id):
-    """Deletes a document from the vector store."""
-    if not central_agent or not central_agent.orchestrator.collection:
-        return jsonify({"error": "Chatbot agent or collection not initialized"}), 500
-    try:
-        central_agent.orchestrator.collection.delete(ids=[doc_id])
-        return jsonify({"message": "Document deleted successfully"}), 200
-    except Exception as e:
-        print(f"Error deleting document: {e}")
-        return jsonify({"error": "Failed to delete document"}), 500
-def delete_vector_store_document(doc_id):
-    """Deletes a document from the vector store."""
+    """Deletes a document (or a single chunk, by chunk ID) from the vector store."""
     if not central_agent:
         return jsonify({"error": "Chatbot agent not initialized"}), 500
     try:
-        central_agent.delete_document(doc_id)
+        if not central_agent.delete_document(doc_id):
+            return jsonify({"error": f"Document {doc_id} not found"}), 404
         return jsonify({"message": f"Document {doc_id} deleted successfully"}), 200
     except Exception as e:
         print(f"Error deleting document: {e}")
@@ -177,17 +292,7 @@ def delete_vector_store_document(doc_id):
 
 @app.route('/api/vector_store/status', methods=['GET'])
 def get_vector_store_status():
-    """Retrieves the status of the vector store."""
-    if not central_agent or not central_agent.orchestrator.collection:
-        return jsonify({"error": "Chatbot agent or collection not initialized"}), 500
-    try:
-        count = central_agent.orchestrator.collection.count()
-        return jsonify({"status": {"document_count": count}}), 200
-    except Exception as e:
-        print(f"Error getting vector store status: {e}")
-        return jsonify({"error": "Failed to get vector store status"}), 500
-def get_vector_store_status():
-    """Retrieves the status of the vector store."""
+    """Retrieves the status of the vector store from the catalogue's running totals."""
     if not central_agent:
         return jsonify({"error": "Chatbot agent not initialized"}), 500
     try:
@@ -0,0 +1,10 @@
+# WSGI entry point for production serving, e.g.:
+#   gunicorn -c app/gunicorn.conf.py app.wsgi:app
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from chatbot_v3.app.server import app
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5001)
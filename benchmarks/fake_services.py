@@ -0,0 +1,261 @@
+"""
+Local stand-ins for the external services used by the ToolOrchestrator, for offline
+benchmarks: an HTTP server answering Entrez esearch/efetch, the DuckDuckGo HTML
+endpoint and the result pages it links to from the recorded fixtures in
+benchmarks/fixtures, a seeded synthetic corpus for the vector store, and a
+deterministic hashing embedding function so Chroma never downloads a model.
+"""
+import os
+import time
+import random
+import hashlib
+import logging
+import threading
+from html import escape
+from string import Template
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+EMBEDDING_DIMENSIONS = 256
+# Number of results returned by the fake DuckDuckGo endpoint per query
+WEB_RESULTS_PER_QUERY = 5
+# Fixed Last-Modified date of the fake result pages
+PAGE_LAST_MODIFIED = "Mon, 06 Jan 2025 09:00:00 GMT"
+
+# Vocabulary for the synthetic corpus, PubMed abstracts and web snippets
+TOPICS = ["alzheimer's disease", "amyloid beta", "tau protein", "microglia", "neuroinflammation", "apoe4",
+          "synaptic loss", "cognitive decline", "lecanemab", "donanemab", "cholinesterase inhibitors",
+          "memantine", "blood-brain barrier", "biomarkers", "pet imaging", "cerebrospinal fluid",
+          "mild cognitive impairment", "vascular dementia", "parkinson's disease", "alpha-synuclein",
+          "oxidative stress", "mitochondrial dysfunction", "gut microbiome", "sleep disruption",
+          "insulin resistance", "deep brain stimulation", "gene therapy", "clinical trial", "neurogenesis",
+          "hippocampal atrophy"]
+FINDINGS = ["is associated with", "accelerates", "slows", "is reduced by", "predicts", "correlates with",
+            "is a risk factor for", "may protect against", "is elevated in", "modulates"]
+CONTEXTS = ["in transgenic mouse models", "in a randomized controlled trial", "in a longitudinal cohort",
+            "in post-mortem tissue", "in early-stage patients", "across multiple ethnic groups",
+            "in a meta-analysis of 42 studies", "in patient-derived organoids", "after 18 months of follow-up"]
+
+def _load_fixture(name: str) -> Template:
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return Template(f.read())
+
+def _stable_seed(*parts) -> int:
+    # Seed derived from the inputs, so the same query always gets the same answer
+    return int(hashlib.sha256("\x1f".join(map(str, parts)).encode("utf-8")).hexdigest()[:16], 16)
+
+def synthetic_sentence(rng: random.Random) -> str:
+    first, second = rng.sample(TOPICS, 2)
+    return f"{first.capitalize()} {rng.choice(FINDINGS)} {second} {rng.choice(CONTEXTS)}."
+
+def synthetic_corpus(size: int, seed: int = 0, sentences: int = 6) -> List[dict]:
+    """
+    Returns `size` reproducible documents for the vector store, each a dict with "id",
+    "text" and "metadata" (its source name).
+    """
+    rng = random.Random(seed)
+    return [{"id": f"synthetic_{seed}_{index}",
+             "text": " ".join(synthetic_sentence(rng) for _ in range(sentences)),
+             "metadata": {"source": f"synthetic_{index % 50}.txt"}} for index in range(size)]
+
+def synthetic_queries(count: int, seed: int = 0) -> List[str]:
+    # Queries drawn from the corpus vocabulary, with repeats so caches see realistic reuse
+    rng = random.Random(seed)
+    pool = [f"{rng.choice(['What is known about', 'Latest research on', 'How does', 'Treatments targeting'])} "
+            f"{' and '.join(rng.sample(TOPICS, 2))}" for _ in range(max(1, count // 3))]
+    return [rng.choice(pool) for _ in range(count)]
+
+class HashingEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Deterministic bag-of-words embeddings via the hashing trick. Costs microseconds per
+    text and needs no model download, so vector store timings reflect Chroma itself.
+    """
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def __call__(self, input: Documents) -> Embeddings:
+        embeddings = []
+        for text in input:
+            vector = np.zeros(self.dimensions, dtype=np.float32)
+            for token in text.lower().split():
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                vector[int.from_bytes(digest, "little") % self.dimensions] += 1.0
+            norm = np.linalg.norm(vector)
+            embeddings.append(vector / norm if norm else vector)
+        return embeddings
+
+    @staticmethod
+    def name() -> str:
+        return "benchmark_hashing"
+
+    def get_config(self) -> dict:
+        return {"dimensions": self.dimensions}
+
+    @staticmethod
+    def build_from_config(config: dict) -> "HashingEmbeddingFunction":
+        return HashingEmbeddingFunction(config.get("dimensions", EMBEDDING_DIMENSIONS))
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    # Keep-alive like the real services, so the shared connection pool is exercised
+    protocol_version = "HTTP/1.1"
+    server: "FakeServices"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path.endswith("/esearch.fcgi"):
+            route, render = "esearch", self.server.render_esearch
+        elif url.path.endswith("/efetch.fcgi"):
+            route, render = "efetch", self.server.render_efetch
+        elif url.path.rstrip("/").endswith("/html"):
+            route, render = "web", self.server.render_web_search
+        elif url.path.startswith("/pages/"):
+            route, render = "pages", self.server.render_page
+            params["page"] = url.path[len("/pages/"):]
+        else:
+            self._send(404, "text/plain", b"Not found")
+            return
+        status = self.server.simulate(route)
+        if status != 200:
+            self._send(status, "text/plain", b"Injected error", {"Retry-After": "1"} if status == 429 else None)
+            return
+        body = render(params).encode("utf-8")
+        headers = None
+        if route == "pages":
+            # Pages never change, so a matching validator is always answered with 304
+            etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+            headers = {"ETag": etag, "Last-Modified": PAGE_LAST_MODIFIED}
+            if self.headers.get("If-None-Match") == etag:
+                with self.server.lock:
+                    self.server.stats["not_modified"] += 1
+                self._send(304, "text/html; charset=utf-8", b"", headers)
+                return
+        content_type = "text/xml; charset=utf-8" if route in ("esearch", "efetch") else "text/html; charset=utf-8"
+        self._send(200, content_type, body, headers)
+
+    def _send(self, status: int, content_type: str, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+class FakeServices(ThreadingHTTPServer):
+    """
+    Threaded HTTP server standing in for NCBI E-utilities, DuckDuckGo and the pages it
+    links to (which carry an ETag and answer revalidation with 304). Responses are
+    rendered from the recorded fixtures and depend only on the request, so runs are
+    reproducible. Every request waits `latency_ms` plus up to `jitter_ms`, and fails
+    with a 503 or 429 with probability `error_rate` (drawn from a seeded generator).
+    Point EUTILS_BASE_URL at `eutils_base_url` and WEB_SEARCH_URL at `web_search_url`.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        super().__init__((host, port), FakeServiceHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"esearch": 0, "efetch": 0, "web": 0, "pages": 0, "not_modified": 0, "errors": 0}
+        self.thread: Optional[threading.Thread] = None
+        self.esearch_template = _load_fixture("esearch.xml")
+        self.efetch_template = _load_fixture("efetch.xml")
+        self.article_template = _load_fixture("efetch_article.xml")
+        self.web_template = _load_fixture("duckduckgo.html")
+        self.web_result_template = _load_fixture("duckduckgo_result.html")
+        self.page_template = _load_fixture("article.html")
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def eutils_base_url(self) -> str:
+        return f"{self.base_url}/entrez/eutils/"
+
+    @property
+    def web_search_url(self) -> str:
+        return f"{self.base_url}/html/"
+
+    def start(self) -> "FakeServices":
+        self.thread = threading.Thread(target=self.serve_forever, name="fake-services", daemon=True)
+        self.thread.start()
+        logging.info(f"Fake NCBI and DuckDuckGo services listening on {self.base_url}")
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "FakeServices":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def simulate(self, route: str) -> int:
+        # Sleep for the configured latency and decide whether to inject an error
+        with self.lock:
+            self.stats[route] += 1
+            delay = self.latency_ms + self.rng.uniform(0, self.jitter_ms)
+            failed = self.rng.random() < self.error_rate
+            status = self.rng.choice((503, 429)) if failed else 200
+            if failed:
+                self.stats["errors"] += 1
+        if delay > 0:
+            time.sleep(delay / 1000)
+        return status
+
+    def render_esearch(self, params: Dict[str, str]) -> str:
+        term = params.get("term", "")
+        retmax = int(params.get("retmax", 20))
+        rng = random.Random(_stable_seed("esearch", term))
+        # Small PMID space so popular articles recur across queries, as they do on PubMed
+        pmids = rng.sample(range(30000000, 30002000), retmax)
+        ids = "".join(f"<Id>{pmid}</Id>\n" for pmid in pmids)
+        return self.esearch_template.substitute(count=retmax * 40, retmax=retmax, ids=ids, term=escape(term))
+
+    def render_efetch(self, params: Dict[str, str]) -> str:
+        articles = []
+        for pmid in filter(None, params.get("id", "").split(",")):
+            rng = random.Random(_stable_seed("efetch", pmid))
+            title = synthetic_sentence(rng).rstrip(".")
+            abstract = " ".join(synthetic_sentence(rng) for _ in range(rng.randint(4, 8)))
+            articles.append(self.article_template.substitute(pmid=escape(pmid), title=escape(title), abstract=escape(abstract)))
+        return self.efetch_template.substitute(articles="".join(articles))
+
+    def render_web_search(self, params: Dict[str, str]) -> str:
+        query = params.get("q", "")
+        rng = random.Random(_stable_seed("web", query))
+        results = []
+        for index in range(WEB_RESULTS_PER_QUERY):
+            topic = rng.choice(TOPICS)
+            results.append(self.web_result_template.substitute(
+                url=f"{self.base_url}/pages/{topic.replace(' ', '-').replace(chr(39), '')}-{index}",
+                title=escape(f"{topic.title()} - overview"), snippet=escape(synthetic_sentence(rng))))
+        return self.web_template.substitute(query=escape(query), results="".join(results))
+
+    def render_page(self, params: Dict[str, str]) -> str:
+        # Result page linked from the search results: an article amid navigation boilerplate
+        page = params.get("page", "")
+        rng = random.Random(_stable_seed("page", page))
+        paragraphs = "\n".join(f"<p>{escape(' '.join(synthetic_sentence(rng) for _ in range(rng.randint(3, 6))))}</p>"
+                               for _ in range(rng.randint(4, 10)))
+        return self.page_template.substitute(title=escape(page.replace("-", " ").title()), paragraphs=paragraphs)
@@ -0,0 +1,270 @@
+"""
+Offline benchmark and load test for the chatbot pipeline.
+
+Starts local fake NCBI and DuckDuckGo services, seeds a throwaway vector store with a
+synthetic corpus, and drives ToolOrchestrator.run_tools, CentralAgent.process_query
+and the Flask /chat and /upload routes at fixed concurrency levels. Reports p50/p95/p99
+latency, throughput and error rate per target and concurrency level as JSON, and can
+compare a run against an earlier report. Example:
+
+    python benchmarks/run_benchmark.py --targets orchestrator chat --concurrency 1 4 16 \\
+        --requests 200 --latency-ms 80 --jitter-ms 40 --error-rate 0.01 --compare baseline.json
+"""
+import os
+import io
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from fake_services import FakeServices, HashingEmbeddingFunction, synthetic_corpus, synthetic_queries, synthetic_sentence
+
+TARGETS = ("orchestrator", "agent", "chat", "upload")
+TOOLS = ["VectorStore", "PubMed", "WebSearch"]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# Upload jobs are polled at this interval until they finish
+UPLOAD_POLL_INTERVAL = 0.01
+UPLOAD_TIMEOUT = 120.0
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline latency and throughput benchmark for the chatbot pipeline.")
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS), help="What to drive (default: all).")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16], help="Concurrency levels to run at.")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per target and concurrency level.")
+    parser.add_argument("--upload-requests", type=int, default=None, help="Requests for the upload target (default: --requests).")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests run before each target.")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Base latency of the fake services.")
+    parser.add_argument("--jitter-ms", type=float, default=25.0, help="Extra uniform random latency of the fake services.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake service calls failing with 503/429.")
+    parser.add_argument("--corpus-size", type=int, default=2000, help="Synthetic documents seeded into the vector store.")
+    parser.add_argument("--upload-kb", type=int, default=32, help="Size of each uploaded document in KB.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the corpus, queries and injected faults.")
+    parser.add_argument("--ncbi-rate-limit", type=float, default=None,
+                        help="NCBI requests per second (default: the app's own limit; 0 disables limiting).")
+    parser.add_argument("--enrich-web", action="store_true", help="Fetch and extract the web search result pages.")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the semantic, PubMed and web page caches.")
+    parser.add_argument("--output", help="Where to write the JSON report (default: benchmarks/results/<timestamp>.json).")
+    parser.add_argument("--compare", help="Earlier JSON report to compare this run against.")
+    return parser.parse_args(argv)
+
+def configure_environment(args: argparse.Namespace, services: FakeServices, work_dir: str) -> None:
+    # The pipeline reads its settings at import time, so this must run before importing it
+    os.environ.setdefault("ENTREZ_EMAIL", "benchmark@example.com")
+    os.environ["EUTILS_BASE_URL"] = services.eutils_base_url
+    os.environ["WEB_SEARCH_URL"] = services.web_search_url
+    os.environ["VECTOR_STORE_PATH"] = os.path.join(work_dir, "vector_store")
+    os.environ["PUBMED_CACHE_PATH"] = os.path.join(work_dir, "pubmed_cache.sqlite3")
+    os.environ["UPLOAD_FOLDER"] = os.path.join(work_dir, "uploads")
+    os.environ["RATE_LIMIT_PATH"] = os.path.join(work_dir, "rate_limits.sqlite3")
+    os.environ["WEB_PAGE_CACHE_PATH"] = os.path.join(work_dir, "web_page_cache.sqlite3")
+    os.environ["WEB_ENRICH"] = "true" if args.enrich_web else "false"
+    os.environ["CONVERSATION_STORE_PATH"] = ""
+    os.environ.pop("NCBI_API_KEY", None)
+    if args.ncbi_rate_limit is not None:
+        os.environ["NCBI_RATE_LIMIT"] = str(args.ncbi_rate_limit)
+    if args.no_cache:
+        os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+        os.environ["PUBMED_QUERY_TTL"] = "0"
+        os.environ["PUBMED_ARTICLE_TTL"] = "0"
+        os.environ["WEB_PAGE_CACHE_TTL"] = "0"
+
+def import_pipeline():
+    # Import the package the same way app/server.py does: from the directory above the repo
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+    from chatbot_v3.src.tool_orchestrator import ToolOrchestrator
+    from chatbot_v3.src.central_agent import CentralAgent
+    from chatbot_v3.src.ingestion_queue import IngestionQueue
+    from chatbot_v3.app import server
+    return ToolOrchestrator, CentralAgent, IngestionQueue, server
+
+def seed_corpus(orchestrator, size: int, seed: int) -> float:
+    # Bulk-load the synthetic corpus in batches and return the time taken
+    start = time.monotonic()
+    corpus = synthetic_corpus(size, seed)
+    for offset in range(0, len(corpus), 500):
+        batch = corpus[offset:offset + 500]
+        orchestrator.add_documents([doc["text"] for doc in batch], [doc["id"] for doc in batch], [doc["metadata"] for doc in batch])
+    return time.monotonic() - start
+
+def build_operations(target: str, orchestrator, agent, server, args: argparse.Namespace) -> Callable[[int], bool]:
+    """
+    Returns a function that performs request number `i` for a target and returns
+    whether it succeeded. Flask targets keep one test client per worker thread.
+    """
+    queries = synthetic_queries(max(args.requests, 1) * 4, args.seed)
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, "client"):
+            local.client = server.app.test_client()
+        return local.client
+
+    if target == "orchestrator":
+        def operation(i: int) -> bool:
+            results = orchestrator.run_tools(TOOLS, queries[i % len(queries)])
+            return all(result["status"] in ("ok", "empty") for result in results.values())
+    elif target == "agent":
+        def operation(i: int) -> bool:
+            response, _ = agent.process_query(queries[i % len(queries)])
+            return bool(response)
+    elif target == "chat":
+        def operation(i: int) -> bool:
+            response = client().post("/chat", json={"query": queries[i % len(queries)], "session_id": f"bench-{i % 64}"})
+            return response.status_code == 200
+    elif target == "upload":
+        def operation(i: int) -> bool:
+            # Unique content per upload, otherwise the queue skips it as a duplicate
+            sentences = random.Random(f"{args.seed}-{i}")
+            text = f"Benchmark upload {uuid.uuid4().hex}.\n"
+            while len(text) < args.upload_kb * 1024:
+                text += synthetic_sentence(sentences) + " "
+            data = {"document": (io.BytesIO(text.encode("utf-8")), f"bench_{uuid.uuid4().hex}.txt")}
+            response = client().post("/upload", data=data, content_type="multipart/form-data")
+            if response.status_code != 202:
+                return False
+            job_id = response.get_json()["job_id"]
+            deadline = time.monotonic() + UPLOAD_TIMEOUT
+            while time.monotonic() < deadline:
+                job = client().get(f"/api/ingestion/jobs/{job_id}").get_json()["job"]
+                if job["status"] in ("completed", "failed", "cancelled", "skipped"):
+                    return job["status"] == "completed"
+                time.sleep(UPLOAD_POLL_INTERVAL)
+            return False
+    else:
+        raise ValueError(f"Unknown benchmark target: {target}")
+    return operation
+
+def run_level(operation: Callable[[int], bool], concurrency: int, requests: int, offset: int = 0) -> dict:
+    # Run `requests` operations on `concurrency` threads and summarize latency and throughput
+    latencies = np.zeros(requests, dtype=np.float64)
+    succeeded = np.zeros(requests, dtype=bool)
+
+    def timed(i: int) -> None:
+        start = time.perf_counter()
+        try:
+            succeeded[i] = operation(offset + i)
+        except Exception:
+            succeeded[i] = False
+        latencies[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(requests)))
+    wall = time.perf_counter() - start
+    errors = int(requests - succeeded.sum())
+    milliseconds = latencies * 1000
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(requests / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(float(milliseconds.mean()), 2),
+            "p50": round(float(np.percentile(milliseconds, 50)), 2),
+            "p95": round(float(np.percentile(milliseconds, 95)), 2),
+            "p99": round(float(np.percentile(milliseconds, 99)), 2),
+            "max": round(float(milliseconds.max()), 2),
+        },
+    }
+
+def compare_reports(current: dict, baseline: dict) -> List[dict]:
+    """
+    Matches results by (target, concurrency) and returns the relative change of each
+    latency percentile and of throughput; positive latency deltas are regressions.
+    """
+    baseline_results = {(result["target"], result["concurrency"]): result for result in baseline.get("results", [])}
+    rows = []
+    for result in current["results"]:
+        previous = baseline_results.get((result["target"], result["concurrency"]))
+        if not previous:
+            continue
+        row = {"target": result["target"], "concurrency": result["concurrency"]}
+        for percentile in ("p50", "p95", "p99"):
+            before, after = previous["latency_ms"][percentile], result["latency_ms"][percentile]
+            row[f"{percentile}_change"] = round((after - before) / before, 4) if before else None
+        before, after = previous["throughput_rps"], result["throughput_rps"]
+        row["throughput_change"] = round((after - before) / before, 4) if before else None
+        rows.append(row)
+    return rows
+
+def format_table(report: dict, comparison: Optional[List[dict]] = None) -> str:
+    changes = {(row["target"], row["concurrency"]): row for row in comparison or []}
+    lines = [f"{'target':<13}{'conc':>5}{'req':>6}{'err':>5}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+             + ("   vs baseline (p50/p95/p99/rps)" if comparison else "")]
+    for result in report["results"]:
+        latency = result["latency_ms"]
+        line = (f"{result['target']:<13}{result['concurrency']:>5}{result['requests']:>6}{result['errors']:>5}"
+                f"{result['throughput_rps']:>9.1f}{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['p99']:>10.1f}")
+        row = changes.get((result["target"], result["concurrency"]))
+        if row:
+            line += "   " + " / ".join("n/a" if row[key] is None else f"{row[key]:+.1%}"
+                                       for key in ("p50_change", "p95_change", "p99_change", "throughput_change"))
+        lines.append(line)
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    args = parse_args(argv)
+    work_dir = tempfile.mkdtemp(prefix="chatbot_benchmark_")
+    services = FakeServices(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, seed=args.seed).start()
+    try:
+        configure_environment(args, services, work_dir)
+        ToolOrchestrator, CentralAgent, IngestionQueue, server = import_pipeline()
+        orchestrator = ToolOrchestrator(embedding_function=HashingEmbeddingFunction())
+        seed_seconds = seed_corpus(orchestrator, args.corpus_size, args.seed)
+        agent = CentralAgent(orchestrator)
+        # Point the Flask app at the benchmark agent so /chat and /upload use the fakes too
+        server.central_agent = agent
+        server.ingestion_queue = IngestionQueue(orchestrator)
+        server.app.config["UPLOAD_FOLDER"] = os.environ["UPLOAD_FOLDER"]
+
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+            "corpus_seed_seconds": round(seed_seconds, 3),
+            "results": [],
+        }
+        for target in args.targets:
+            operation = build_operations(target, orchestrator, agent, server, args)
+            requests = args.upload_requests if target == "upload" and args.upload_requests else args.requests
+            if args.warmup:
+                run_level(operation, 1, args.warmup, offset=10 ** 6)
+            for level, concurrency in enumerate(args.concurrency):
+                result = run_level(operation, concurrency, requests, offset=level * requests)
+                report["results"].append({"target": target, **result})
+                print(f"{target} x{concurrency}: {result['throughput_rps']} req/s, p50 {result['latency_ms']['p50']} ms, "
+                      f"p99 {result['latency_ms']['p99']} ms, {result['errors']} errors", flush=True)
+        report["fake_service_calls"] = dict(services.stats)
+
+        comparison = None
+        if args.compare:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                comparison = compare_reports(report, json.load(f))
+            report["comparison"] = {"baseline": args.compare, "changes": comparison}
+
+        output = args.output or os.path.join(RESULTS_DIR, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print()
+        print(format_table(report, comparison))
+        print(f"\nReport written to {output}")
+        return report
+    finally:
+        services.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
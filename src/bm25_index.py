@@ -0,0 +1,202 @@
+import os
+import re
+import math
+import pickle
+import logging
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Tokens keep internal hyphens and apostrophes so terms like "app-ps1" or "alzheimer's" survive
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['\-][a-z0-9]+)*")
+STOPWORDS = frozenset("a an and are as at be by for from has have in is it its of on or that the this to was were which with".split())
+# Deleted documents are compacted away once they make up this fraction of the index
+COMPACTION_RATIO = 0.25
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """
+    In-process lexical index with Okapi BM25 scoring. Postings are kept per term as
+    compact typed arrays (document numbers and term frequencies) and scored with NumPy,
+    so a lookup needs no embedding call. Documents can be added and deleted
+    incrementally; deletions are tombstoned and compacted in bulk. The index can be
+    saved to and loaded from a pickle file next to the vector store.
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.RLock()
+        self.vocabulary: Dict[str, int] = {}
+        self.postings: List[array] = []     # term id -> document numbers
+        self.frequencies: List[array] = []  # term id -> term frequencies, aligned with postings
+        self.doc_ids: List[str] = []
+        self.sources: List[str] = []
+        self.doc_lengths = array("I")
+        self.alive = bytearray()
+        self.doc_numbers: Dict[str, int] = {}  # live document ID -> document number
+        self.total_length = 0
+        self.scores = np.zeros(0, dtype=np.float32)  # scratch buffer for search, not saved
+
+    def __len__(self) -> int:
+        return len(self.doc_numbers)
+
+    def add(self, doc_id: str, text: str, source: str = "unknown") -> None:
+        # Index a document, replacing any earlier version with the same ID
+        terms = Counter(tokenize(text))
+        with self.lock:
+            if doc_id in self.doc_numbers:
+                self._delete(doc_id)
+            doc_number = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.sources.append(source)
+            length = sum(terms.values())
+            self.doc_lengths.append(length)
+            self.alive.append(1)
+            self.doc_numbers[doc_id] = doc_number
+            self.total_length += length
+            for term, frequency in terms.items():
+                term_id = self.vocabulary.get(term)
+                if term_id is None:
+                    term_id = self.vocabulary[term] = len(self.postings)
+                    self.postings.append(array("I"))
+                    self.frequencies.append(array("I"))
+                self.postings[term_id].append(doc_number)
+                self.frequencies[term_id].append(frequency)
+
+    def delete(self, doc_id: str) -> bool:
+        with self.lock:
+            deleted = self._delete(doc_id)
+            self._maybe_compact()
+            return deleted
+
+    def delete_source(self, source: str) -> int:
+        # Delete every document indexed under a source name
+        with self.lock:
+            doc_ids = [self.doc_ids[number] for number in self.doc_numbers.values() if self.sources[number] == source]
+            for doc_id in doc_ids:
+                self._delete(doc_id)
+            self._maybe_compact()
+            return len(doc_ids)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float, str]]:
+        """Returns up to k (doc_id, score, source) tuples, best first."""
+        with self.lock:
+            if not self.doc_numbers:
+                return []
+            doc_count = len(self.doc_numbers)
+            average_length = self.total_length / doc_count or 1.0
+            doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+            # Tombstones only need filtering while there are any (i.e. until the next compaction)
+            alive = np.frombuffer(self.alive, dtype=np.bool_) if doc_count < len(self.doc_ids) else None
+            if len(self.scores) < len(self.doc_ids):
+                self.scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+            # Scores accumulate in a buffer reused across queries and zeroed again after ranking,
+            # so a query does not allocate or copy anything the size of the index
+            scores, matched = self.scores, []
+            for term in set(tokenize(query)):
+                term_id = self.vocabulary.get(term)
+                if term_id is None:
+                    continue
+                docs = np.frombuffer(self.postings[term_id], dtype=np.uint32)
+                frequencies = np.frombuffer(self.frequencies[term_id], dtype=np.uint32).astype(np.float32)
+                if alive is not None:
+                    live = alive[docs]
+                    docs, frequencies = docs[live], frequencies[live]
+                if not len(docs):
+                    continue
+                idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_lengths[docs] / average_length)
+                scores[docs] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+                matched.append(docs)
+            if not matched:
+                return []
+            if sum(len(docs) for docs in matched) < len(self.doc_ids) // 4:
+                # Few postings: collect each matched document once. Its score is zeroed as it is
+                # taken, so the same document listed under a later term is skipped
+                candidate_parts, score_parts = [], []
+                for docs in matched:
+                    taken = scores[docs]
+                    docs, taken = docs[taken > 0], taken[taken > 0]
+                    scores[docs] = 0.0
+                    candidate_parts.append(docs)
+                    score_parts.append(taken)
+                candidates, candidate_scores = np.concatenate(candidate_parts), np.concatenate(score_parts)
+            else:
+                # Common terms: a scan of the score buffer is cheaper than walking the postings again
+                candidates = np.flatnonzero(scores)
+                candidate_scores = scores[candidates]
+                scores[candidates] = 0.0
+            if len(candidates) > k:
+                top = np.argpartition(-candidate_scores, k - 1)[:k]
+                candidates, candidate_scores = candidates[top], candidate_scores[top]
+            # Best first; equal scores keep index order
+            order = np.lexsort((candidates, -candidate_scores))
+            return [(self.doc_ids[number], float(candidate_scores[position]), self.sources[number])
+                    for position, number in zip(order, candidates[order])]
+
+    def save(self, path: str) -> None:
+        # Write atomically so readers in other processes never see a partial file
+        with self.lock:
+            state = {key: getattr(self, key) for key in ("k1", "b", "vocabulary", "postings", "frequencies", "doc_ids",
+                                                        "sources", "doc_lengths", "alive", "doc_numbers", "total_length")}
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        # Load a saved index, or return None if there is none or it cannot be read
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except Exception as e:
+            logging.error(f"Error loading BM25 index from {path}: {e}")
+            return None
+        index = cls(state.pop("k1"), state.pop("b"))
+        index.__dict__.update(state)
+        return index
+
+    def _delete(self, doc_id: str) -> bool:
+        # Tombstone a document (lock held)
+        doc_number = self.doc_numbers.pop(doc_id, None)
+        if doc_number is None:
+            return False
+        self.alive[doc_number] = 0
+        self.total_length -= self.doc_lengths[doc_number]
+        return True
+
+    def _maybe_compact(self) -> None:
+        # Rebuild the arrays without tombstoned documents once they pile up (lock held)
+        dead = len(self.doc_ids) - len(self.doc_numbers)
+        if dead == 0 or dead < COMPACTION_RATIO * len(self.doc_ids):
+            return
+        renumber = array("I", [0]) * len(self.doc_ids)
+        doc_ids, sources, doc_lengths = [], [], array("I")
+        for number, doc_id in enumerate(self.doc_ids):
+            if self.alive[number]:
+                renumber[number] = len(doc_ids)
+                doc_ids.append(doc_id)
+                sources.append(self.sources[number])
+                doc_lengths.append(self.doc_lengths[number])
+        vocabulary, postings, frequencies = {}, [], []
+        for term, term_id in self.vocabulary.items():
+            kept = [(renumber[doc], frequency) for doc, frequency in zip(self.postings[term_id], self.frequencies[term_id]) if self.alive[doc]]
+            if kept:
+                vocabulary[term] = len(postings)
+                postings.append(array("I", (doc for doc, _ in kept)))
+                frequencies.append(array("I", (frequency for _, frequency in kept)))
+        self.vocabulary, self.postings, self.frequencies = vocabulary, postings, frequencies
+        self.doc_ids, self.sources, self.doc_lengths = doc_ids, sources, doc_lengths
+        self.alive = bytearray([1]) * len(doc_ids)
+        self.doc_numbers = {doc_id: number for number, doc_id in enumerate(doc_ids)}
@@ -1,25 +1,55 @@
 import os
+import re
+import time
 import logging
-import logging
-from typing import List, Dict, Tuple
+import threading
+from typing import Iterator, List, Dict, Optional, Tuple
+
+import numpy as np
 
 from chatbot_v3.src.tool_orchestrator import ToolOrchestrator
+from chatbot_v3.src.metrics import METRICS
+from chatbot_v3.src.context_aggregator import ContextAggregator
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Semantic response cache settings. A query whose embedding has cosine similarity of at
+# least SEMANTIC_CACHE_THRESHOLD with an earlier query reuses that query's response.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+# Stop waiting for the remaining tools as soon as the EvaluatorAgent finds the context sufficient.
+# Off by default: an early exit answers without the slower sources. The evaluator still runs
+# when it is off, and the time an early exit would have saved is recorded in the metrics.
+EARLY_TERMINATION = os.getenv("EARLY_TERMINATION", "false").lower() in ("1", "true", "yes")
+
 class EvaluatorAgent:
+    SECTION_TITLES = ("Vector Store Results:", "PubMed Results:", "Web Search Results:")
+
     def evaluate_context(self, context: str) -> bool:
         """
         Evaluates the quality and relevance of the context.
-        Currently checks if the context contains results from at least two different sources
-        (Vector Store, PubMed, and Web Search).
+        Currently checks that the Vector Store returned passages and that at least one other
+        source (PubMed or Web Search) did too. Sections that are missing, empty or only say
+        "No results found." do not count.
         """
-        has_vector_store = "Vector Store Results:" in context
-        has_pubmed = "PubMed Results:" in context
-        has_web_search = "Web Search Results:" in context
+        sections = self._sections(context)
+        has_vector_store = bool(sections.get("Vector Store Results:"))
+        has_pubmed = bool(sections.get("PubMed Results:"))
+        has_web_search = bool(sections.get("Web Search Results:"))
 
-        return sum([has_vector_store, has_pubmed, has_web_search]) >= 2
+        return has_vector_store and (has_pubmed or has_web_search)
+
+    def _sections(self, context: str) -> dict:
+        # Map each section title in the context to its body; "No results found." counts as empty
+        parts = re.split(r"^(%s)$" % "|".join(map(re.escape, self.SECTION_TITLES)), context, flags=re.MULTILINE)
+        sections = {}
+        for title, body in zip(parts[1::2], parts[2::2]):
+            body = body.strip()
+            sections[title] = "" if body == "No results found." else body
+        return sections
 
 class FinishingAgent:
     def synthesize_response(self, context: str) -> str:
@@ -31,23 +61,237 @@ class FinishingAgent:
         synthesized_response = "Here's a comprehensive summary of the information gathered: " + context
         return synthesized_response
 
+class SemanticCache:
+    """
+    Caches responses keyed by query embedding. Lookups compare the query embedding
+    against all cached embeddings with one matrix-vector product and return the most
+    similar entry above the threshold. Entries expire after `ttl` seconds, the oldest
+    entries are evicted beyond `max_entries`, and the whole cache is dropped when the
+    vector store version it was built against changes.
+    """
+    def __init__(self, threshold: float = 0.92, ttl: float = 600, max_entries: int = 512):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self.entries = []  # (query, response, sources, created_at), aligned with embeddings rows
+        self.version = None
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def lookup(self, embedding: List[float], version: int) -> Optional[Tuple[str, list]]:
+        # Return (response, sources) of the most similar fresh entry, or None
+        query_vector = self._normalize(embedding)
+        with self.lock:
+            self._check_version(version)
+            self._expire()
+            if not self.entries:
+                self.stats["misses"] += 1
+                return None
+            similarities = self.embeddings @ query_vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            cached_query, response, sources, _ = self.entries[best]
+            logging.info(f"Semantic cache hit (similarity {similarities[best]:.3f}) with earlier query: '{cached_query}'")
+            return response, list(sources)
+
+    def store(self, query: str, embedding: List[float], response: str, sources: list, version: int) -> None:
+        query_vector = self._normalize(embedding)
+        with self.lock:
+            self._check_version(version)
+            if self.embeddings.shape[1] != query_vector.shape[0]:
+                self.embeddings = np.zeros((0, query_vector.shape[0]), dtype=np.float32)
+                self.entries = []
+            self.embeddings = np.vstack([self.embeddings, query_vector])
+            self.entries.append((query, response, list(sources), time.time()))
+            overflow = len(self.entries) - self.max_entries
+            if overflow > 0:
+                self.embeddings = self.embeddings[overflow:]
+                self.entries = self.entries[overflow:]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.embeddings = np.zeros((0, 0), dtype=np.float32)
+            self.entries = []
+            self.stats["invalidations"] += 1
+
+    def _check_version(self, version: int) -> None:
+        # Drop every entry when the vector store has changed since they were cached
+        if self.version != version:
+            if self.entries:
+                logging.info("Vector store changed; clearing semantic cache.")
+                self.embeddings = np.zeros((0, 0), dtype=np.float32)
+                self.entries = []
+                self.stats["invalidations"] += 1
+            self.version = version
+
+    def _expire(self) -> None:
+        # Entries are appended in time order, so expired ones form a prefix
+        cutoff = time.time() - self.ttl
+        expired = 0
+        while expired < len(self.entries) and self.entries[expired][3] < cutoff:
+            expired += 1
+        if expired:
+            self.embeddings = self.embeddings[expired:]
+            self.entries = self.entries[expired:]
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
 class CentralAgent:
-    def __init__(self):
+    def __init__(self, orchestrator: Optional[ToolOrchestrator] = None):
         # Initialize the Central Agent
-        self.orchestrator = ToolOrchestrator()
+        self.orchestrator = orchestrator or ToolOrchestrator()
         self.evaluator = EvaluatorAgent()
         self.finisher = FinishingAgent()
+        self.aggregator = ContextAggregator(self.orchestrator.embed_texts)
+        self.semantic_cache = SemanticCache(SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_MAX_ENTRIES) if SEMANTIC_CACHE_ENABLED else None
+        # Per-thread record of the tools used by the last query, for get_used_tools
+        self._local = threading.local()
+        if self.semantic_cache:
+            METRICS.add_collector(self._collect_cache_metrics)
         logging.info("CentralAgent initialized.")
 
-    def process_query(self, query: str) -> Tuple[str, list]:
-        """Processes the user query and returns a response along with sources."""
-        tools = ["VectorStore", "PubMed", "WebSearch"]
-        # execute_tools returns an aggregated string of results
-        response_string = self.orchestrator.execute_tools(tools, query)
-        # Source information is not directly available from the aggregated string
-        # Returning the string directly and an empty list for sources
-        sources = []
-        return response_string, sources
+    def process_query(self, query: str, timings: Optional[dict] = None) -> Tuple[str, list]:
+        """
+        Processes the user query and returns a response along with sources.
+        If a `timings` dict is passed it is filled with the seconds spent in each stage.
+        """
+        with METRICS.timed("process_query", timings):
+            for event in self.stream_query(query, timings):
+                if event["event"] == "final":
+                    return event["response"], event["sources"]
+
+    def stream_query(self, query: str, timings: Optional[dict] = None) -> Iterator[dict]:
+        """
+        Processes the user query incrementally. Yields a "tool_result" event for each tool
+        as soon as it finishes (with its contents, sources, status and elapsed time),
+        followed by a "final" event carrying the FinishingAgent response, all sources and
+        the per-stage timing breakdown. The EvaluatorAgent checks the context after every
+        result; once it is sufficient, tools still running are abandoned if EARLY_TERMINATION
+        is on, and otherwise the remaining wait is recorded as chatbot_early_exit_potential_seconds.
+        """
+        start = time.monotonic()
+        timings = {} if timings is None else timings
+        query_embedding = self._embed_query(query, timings)
+        if query_embedding is not None:
+            with METRICS.timed("semantic_cache_lookup", timings):
+                cached = self.semantic_cache.lookup(query_embedding, self.orchestrator.vector_store_version)
+            if cached:
+                self._local.used_tools = []
+                context, sources = cached
+                with METRICS.timed("synthesis", timings):
+                    response = self.finisher.synthesize_response(context)
+                yield {"event": "final", "response": response, "sources": sources, "cached": True,
+                       "early_exit": False, "abandoned_tools": [], "elapsed": time.monotonic() - start, "timings": timings}
+                return
+
+        tools = self._plan_tools(query, timings)
+        tool_results = {}
+        early_exit = False
+        sufficient_at = None
+        tool_stream = self.orchestrator.iter_tool_results(tools, query)
+        with METRICS.timed("tool_execution", timings):
+            try:
+                for result in tool_stream:
+                    tool_results[result["tool"]] = result
+                    timings[f"tool_call:{result['tool']}"] = round(result["elapsed"], 6)
+                    yield {"event": "tool_result", **result}
+                    if sufficient_at is None and len(tool_results) < len(tools):
+                        with METRICS.timed("evaluation", timings):
+                            sufficient = self.evaluator.evaluate_context(self._build_context(tools, tool_results, ok_only=True))
+                        if sufficient:
+                            sufficient_at = time.monotonic()
+                            METRICS.inc("chatbot_early_exit_candidates_total")
+                            if EARLY_TERMINATION:
+                                early_exit = True
+                                break
+            finally:
+                # Closing the stream abandons any tools that are still running
+                tool_stream.close()
+        abandoned_tools = [tool for tool in tools if tool not in tool_results]
+        if sufficient_at is not None and not early_exit:
+            METRICS.observe("chatbot_early_exit_potential_seconds", time.monotonic() - sufficient_at)
+        if early_exit:
+            METRICS.inc("chatbot_early_exits_total")
+            logging.info(f"Context sufficient after {len(tool_results)} tools; abandoned {abandoned_tools}.")
+
+        results = [tool_results[tool] for tool in tools if tool in tool_results]
+        # Deduplicate, rank and pack the passages under the token budget
+        with METRICS.timed("context_aggregation", timings):
+            aggregated = self.aggregator.aggregate(query, results)
+        if aggregated["passages"]:
+            context, sources = aggregated["context"], aggregated["sources"]
+        else:
+            # No usable passages (e.g. every tool failed): pass the tool messages through
+            context = self._build_context(tools, tool_results)
+            sources = [source for result in results for source in result["sources"]]
+
+        # Only cache complete answers built from retrieved passages. Timeouts, tool errors, empty
+        # results and early exits are not cached, so the next identical query goes back to the backends.
+        if (query_embedding is not None and aggregated["passages"] and not early_exit
+                and all(result["status"] == "ok" for result in results)):
+            self.semantic_cache.store(query, query_embedding, context, sources, self.orchestrator.vector_store_version)
+        with METRICS.timed("synthesis", timings):
+            response = self.finisher.synthesize_response(context)
+        yield {"event": "final", "response": response, "sources": sources, "cached": False, "early_exit": early_exit,
+               "abandoned_tools": abandoned_tools, "elapsed": time.monotonic() - start, "timings": timings}
+
+    @staticmethod
+    def _build_context(tools: List[str], tool_results: Dict[str, dict], ok_only: bool = False) -> str:
+        # Join tool contents in tool selection order
+        return "\n".join(tool_results[tool]["contents"][0] for tool in tools
+                         if tool in tool_results and (not ok_only or tool_results[tool]["status"] == "ok"))
+
+    def get_used_tools(self) -> List[str]:
+        """Returns the tools used for the last query processed on the calling thread."""
+        return list(getattr(self._local, "used_tools", []))
+
+    def _plan_tools(self, query: str, timings: Optional[dict] = None) -> List[str]:
+        # Recognize the intent and select tools for it, recording the tools for get_used_tools
+        with METRICS.timed("intent_recognition", timings):
+            intent = self.recognize_intent(query)
+        with METRICS.timed("tool_selection", timings):
+            tools = self.select_tools(intent)
+        self._local.used_tools = tools
+        return tools
+
+    def delete_document(self, doc_id: str) -> bool:
+        """Deletes a document from the vector store; cached responses are invalidated by the version bump."""
+        return self.orchestrator.delete_document(doc_id)
+
+    def get_documents(self, limit: int = 50, cursor: Optional[str] = None, **filters) -> dict:
+        """Returns a page of the document catalogue as {"documents", "next_cursor"}."""
+        return self.orchestrator.list_documents(limit, cursor, **filters)
+
+    def get_vector_store_status(self) -> dict:
+        return self.orchestrator.get_vector_store_status()
+
+    def _embed_query(self, query: str, timings: Optional[dict] = None) -> Optional[List[float]]:
+        # Embed the query for the semantic cache; caching is skipped if embedding fails
+        if not self.semantic_cache:
+            return None
+        try:
+            with METRICS.timed("query_embedding", timings):
+                return self.orchestrator.embed_texts([query])[0]
+        except Exception as e:
+            logging.warning(f"Could not embed query for semantic cache: {e}")
+            return None
+
+    def _collect_cache_metrics(self, registry) -> None:
+        # Publish semantic cache counters to the metrics registry
+        stats = self.semantic_cache.stats
+        lookups = stats["hits"] + stats["misses"]
+        registry.set_counter("chatbot_cache_lookups_total", stats["hits"], cache="semantic", result="hit")
+        registry.set_counter("chatbot_cache_lookups_total", stats["misses"], cache="semantic", result="miss")
+        registry.set_gauge("chatbot_cache_hit_ratio", stats["hits"] / lookups if lookups else 0.0, cache="semantic")
+        registry.set_gauge("chatbot_cache_entries", len(self.semantic_cache.entries), cache="semantic", tier="memory")
 
     def recognize_intent(self, query: str) -> str:
         # Placeholder for intent recognition logic
@@ -0,0 +1,98 @@
+import os
+import logging
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Context aggregation settings. Passages whose embeddings have cosine similarity of at least
+# CONTEXT_DEDUPE_THRESHOLD with a higher-ranked passage are dropped as near-duplicates, and the
+# packed context is kept under CONTEXT_TOKEN_BUDGET (estimated) tokens.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_DEDUPE_THRESHOLD = float(os.getenv("CONTEXT_DEDUPE_THRESHOLD", "0.95"))
+# Rough characters-per-token ratio used to estimate passage cost without a tokenizer
+CHARS_PER_TOKEN = 4
+
+SECTION_TITLES = {
+    "VectorStore": "Vector Store Results:",
+    "PubMed": "PubMed Results:",
+    "WebSearch": "Web Search Results:",
+}
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+class ContextAggregator:
+    """
+    Turns tool results into a bounded context. Passages from all tools are embedded in
+    one batch together with the query; near-duplicates are removed with a single NumPy
+    similarity matrix, the rest are ranked by similarity to the query and packed
+    best-first until the token budget is spent. Output stays grouped under the usual
+    per-tool section titles so the EvaluatorAgent can still see which sources answered.
+    """
+    def __init__(self, embed_texts: Callable[[List[str]], List[List[float]]], token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 dedupe_threshold: float = CONTEXT_DEDUPE_THRESHOLD):
+        self.embed_texts = embed_texts
+        self.token_budget = token_budget
+        self.dedupe_threshold = dedupe_threshold
+
+    def aggregate(self, query: str, tool_results: List[dict], token_budget: Optional[int] = None) -> dict:
+        """
+        Aggregates tool result dicts (each with "tool", "status" and "passages") into
+        {"context", "passages", "sources", "stats"}; "passages" are the packed passages
+        in rank order, each with "text", "source", "tool" and "score".
+        """
+        token_budget = token_budget or self.token_budget
+        passages = [{"text": passage["text"].strip(), "source": passage.get("source", "unknown"), "tool": result["tool"]}
+                    for result in tool_results if result.get("status") == "ok"
+                    for passage in result.get("passages", []) if passage.get("text", "").strip()]
+        stats = {"candidates": len(passages), "duplicates": 0, "over_budget": 0}
+        if not passages:
+            return {"context": "", "passages": [], "sources": [], "stats": stats}
+
+        ranked = self._rank(query, passages, stats)
+        packed = []
+        tokens = 0
+        for passage in ranked:
+            cost = estimate_tokens(passage["text"])
+            if tokens + cost > token_budget:
+                stats["over_budget"] += 1
+                continue
+            packed.append(passage)
+            tokens += cost
+        stats.update(packed=len(packed), tokens=tokens)
+
+        sections = []
+        for tool in dict.fromkeys(passage["tool"] for passage in passages):
+            texts = [passage["text"] for passage in packed if passage["tool"] == tool]
+            if texts:
+                sections.append(SECTION_TITLES.get(tool, f"{tool} Results:") + "\n" + "\n\n".join(texts))
+        sources = list(dict.fromkeys(passage["source"] for passage in packed))
+        logging.debug(f"Context aggregation stats: {stats}")
+        return {"context": "\n".join(sections), "passages": packed, "sources": sources, "stats": stats}
+
+    def _rank(self, query: str, passages: List[dict], stats: Dict[str, int]) -> List[dict]:
+        # Drop near-duplicates and order passages by similarity to the query
+        try:
+            embeddings = np.asarray(self.embed_texts([query] + [passage["text"] for passage in passages]), dtype=np.float32)
+        except Exception as e:
+            logging.warning(f"Could not embed passages, falling back to exact deduplication: {e}")
+            unique = list({passage["text"]: passage for passage in passages}.values())
+            stats["duplicates"] = len(passages) - len(unique)
+            return [dict(passage, score=0.0) for passage in unique]
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1, norms)
+        scores = embeddings[1:] @ embeddings[0]
+        similarity = embeddings[1:] @ embeddings[1:].T
+        order = np.argsort(-scores, kind="stable")
+        kept = []
+        for index in order:
+            # Keep a passage only if it is not a near-duplicate of a better-ranked one
+            if kept and similarity[index, kept].max() >= self.dedupe_threshold:
+                stats["duplicates"] += 1
+                continue
+            kept.append(int(index))
+        return [dict(passages[index], score=float(scores[index])) for index in kept]
@@ -0,0 +1,124 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import List, Optional, Tuple
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Conversation store settings. Each session keeps at most CONVERSATION_MAX_TURNS turns and is
+# dropped after CONVERSATION_IDLE_TTL seconds without activity. Set CONVERSATION_STORE_PATH to
+# a SQLite file to keep history across restarts and share it between worker processes.
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "50"))
+CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", str(60 * 60)))
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))
+CONVERSATION_STORE_PATH = os.getenv("CONVERSATION_STORE_PATH", "")
+# How often (seconds) the SQLite backend sweeps idle sessions
+EVICTION_INTERVAL = 60
+
+class ConversationStore:
+    """
+    Per-session conversation history. In memory each session is a ring buffer of its
+    most recent turns, and sessions are kept in least-recently-active order so idle
+    ones can be evicted from the front. With a SQLite path the same caps are enforced
+    on disk instead. Turn IDs increase per session and are used as pagination cursors.
+    """
+    def __init__(self, max_turns: int = CONVERSATION_MAX_TURNS, idle_ttl: float = CONVERSATION_IDLE_TTL,
+                 max_sessions: int = CONVERSATION_MAX_SESSIONS, path: Optional[str] = CONVERSATION_STORE_PATH):
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()  # session_id -> {"turns": deque, "next_turn_id": int, "last_active": float}
+        self.lock = threading.Lock()
+        self.db = None
+        self.last_eviction = 0.0
+        if path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+                self.db.execute("PRAGMA journal_mode=WAL")
+                self.db.execute("CREATE TABLE IF NOT EXISTS conversation_sessions (session_id TEXT PRIMARY KEY, next_turn_id INTEGER NOT NULL, last_active REAL NOT NULL)")
+                self.db.execute("CREATE INDEX IF NOT EXISTS conversation_sessions_last_active ON conversation_sessions (last_active)")
+                self.db.execute("CREATE TABLE IF NOT EXISTS conversation_turns (session_id TEXT NOT NULL, turn_id INTEGER NOT NULL, "
+                                "query TEXT NOT NULL, response TEXT NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (session_id, turn_id))")
+                self.db.commit()
+            except sqlite3.Error as e:
+                logging.error(f"Error opening conversation store at {path}, using memory only: {e}")
+                self.db = None
+
+    def add_turn(self, session_id: str, query: str, response: str) -> dict:
+        # Append a turn to a session, dropping its oldest turn once the cap is reached
+        now = time.time()
+        with self.lock:
+            if self.db:
+                return self._add_turn_db(session_id, query, response, now)
+            session = self.sessions.pop(session_id, None) or {"turns": deque(maxlen=self.max_turns), "next_turn_id": 1}
+            turn = {"turn_id": session["next_turn_id"], "query": query, "response": response, "created_at": now}
+            session["turns"].append(turn)
+            session["next_turn_id"] += 1
+            session["last_active"] = now
+            self.sessions[session_id] = session
+            self._evict_memory(now)
+            return dict(turn)
+
+    def get_history(self, session_id: str, limit: int = 20, before: Optional[int] = None) -> Tuple[List[dict], Optional[int]]:
+        """
+        Returns up to `limit` turns of a session older than turn ID `before` (or the newest
+        turns when it is None), newest first, plus the cursor for the next page or None.
+        """
+        limit = max(1, limit)
+        with self.lock:
+            if self.db:
+                rows = self.db.execute("SELECT turn_id, query, response, created_at FROM conversation_turns WHERE session_id = ? AND turn_id < ? "
+                                       "ORDER BY turn_id DESC LIMIT ?", (session_id, before or 2 ** 62, limit + 1)).fetchall()
+                turns = [{"turn_id": row[0], "query": row[1], "response": row[2], "created_at": row[3]} for row in rows]
+            else:
+                session = self.sessions.get(session_id)
+                turns = []
+                if session and time.time() - session["last_active"] <= self.idle_ttl:
+                    for turn in reversed(session["turns"]):
+                        if before is None or turn["turn_id"] < before:
+                            turns.append(dict(turn))
+                            if len(turns) > limit:
+                                break
+        next_before = turns[limit - 1]["turn_id"] if len(turns) > limit else None
+        return turns[:limit], next_before
+
+    def clear(self, session_id: str) -> None:
+        with self.lock:
+            self.sessions.pop(session_id, None)
+            if self.db:
+                self.db.execute("DELETE FROM conversation_turns WHERE session_id = ?", (session_id,))
+                self.db.execute("DELETE FROM conversation_sessions WHERE session_id = ?", (session_id,))
+                self.db.commit()
+
+    def _evict_memory(self, now: float) -> None:
+        # Sessions are ordered by last activity, so idle ones are at the front (lock held)
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if len(self.sessions) <= self.max_sessions and now - session["last_active"] <= self.idle_ttl:
+                break
+            self.sessions.popitem(last=False)
+
+    def _add_turn_db(self, session_id: str, query: str, response: str, now: float) -> dict:
+        # SQLite variant of add_turn (lock held)
+        row = self.db.execute("SELECT next_turn_id FROM conversation_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        turn_id = row[0] if row else 1
+        self.db.execute("INSERT OR REPLACE INTO conversation_sessions (session_id, next_turn_id, last_active) VALUES (?, ?, ?)",
+                        (session_id, turn_id + 1, now))
+        self.db.execute("INSERT INTO conversation_turns (session_id, turn_id, query, response, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (session_id, turn_id, query, response, now))
+        self.db.execute("DELETE FROM conversation_turns WHERE session_id = ? AND turn_id <= ?", (session_id, turn_id - self.max_turns))
+        if now - self.last_eviction >= EVICTION_INTERVAL:
+            cutoff = now - self.idle_ttl
+            self.db.execute("DELETE FROM conversation_sessions WHERE last_active < ?", (cutoff,))
+            # Enforce the session cap by dropping the least recently active sessions
+            self.db.execute("DELETE FROM conversation_sessions WHERE session_id IN (SELECT session_id FROM conversation_sessions "
+                            "ORDER BY last_active DESC LIMIT -1 OFFSET ?)", (self.max_sessions,))
+            self.db.execute("DELETE FROM conversation_turns WHERE session_id NOT IN (SELECT session_id FROM conversation_sessions)")
+            self.last_eviction = now
+        self.db.commit()
+        return {"turn_id": turn_id, "query": query, "response": response, "created_at": now}
@@ -0,0 +1,170 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DOCUMENT_CATALOG_FILE = "documents.sqlite3"
+# Page size limits for document listings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+DOCUMENT_COLUMNS = ("doc_id", "name", "content_hash", "chunk_count", "size_bytes", "ingested_at")
+
+class DocumentCatalog:
+    """
+    SQLite catalogue of the documents in the vector store: one row per ingested file
+    with its name, content hash, chunk count, size and ingest time. Totals are kept in
+    a one-row stats table updated by triggers in the same transaction as each change,
+    so status reads never scan the catalogue or the vector store. Listings are paged
+    newest first with an opaque (ingested_at, doc_id) cursor over an index. It also
+    holds the vector store version, a counter every writer process bumps after changing
+    the store, so other processes can tell when their view of it is stale. With no
+    path the catalogue is kept in an in-memory database.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or ":memory:"
+        self.lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        if path:
+            self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (doc_id TEXT PRIMARY KEY, name TEXT NOT NULL, content_hash TEXT,
+                chunk_count INTEGER NOT NULL, size_bytes INTEGER NOT NULL, ingested_at REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS documents_ingested_at ON documents (ingested_at, doc_id);
+            CREATE INDEX IF NOT EXISTS documents_content_hash ON documents (content_hash);
+            CREATE INDEX IF NOT EXISTS documents_name ON documents (name);
+            CREATE TABLE IF NOT EXISTS document_stats (id INTEGER PRIMARY KEY CHECK (id = 1), document_count INTEGER NOT NULL,
+                chunk_count INTEGER NOT NULL, total_bytes INTEGER NOT NULL);
+            INSERT OR IGNORE INTO document_stats (id, document_count, chunk_count, total_bytes) VALUES (1, 0, 0, 0);
+            CREATE TABLE IF NOT EXISTS store_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL);
+            INSERT OR IGNORE INTO store_version (id, version) VALUES (1, 0);
+            CREATE TRIGGER IF NOT EXISTS documents_insert AFTER INSERT ON documents BEGIN
+                UPDATE document_stats SET document_count = document_count + 1, chunk_count = chunk_count + NEW.chunk_count,
+                    total_bytes = total_bytes + NEW.size_bytes WHERE id = 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS documents_delete AFTER DELETE ON documents BEGIN
+                UPDATE document_stats SET document_count = document_count - 1, chunk_count = chunk_count - OLD.chunk_count,
+                    total_bytes = total_bytes - OLD.size_bytes WHERE id = 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS documents_update AFTER UPDATE ON documents BEGIN
+                UPDATE document_stats SET chunk_count = chunk_count - OLD.chunk_count + NEW.chunk_count,
+                    total_bytes = total_bytes - OLD.size_bytes + NEW.size_bytes WHERE id = 1;
+            END;
+        """)
+        self.db.commit()
+
+    def upsert(self, doc_id: str, name: str, chunk_count: int, size_bytes: int = 0, content_hash: Optional[str] = None,
+               ingested_at: Optional[float] = None) -> dict:
+        # Record a document, replacing an earlier entry with the same ID
+        document = {"doc_id": doc_id, "name": name, "content_hash": content_hash, "chunk_count": chunk_count,
+                    "size_bytes": size_bytes, "ingested_at": ingested_at or time.time()}
+        with self.lock:
+            # DELETE then INSERT (not INSERT OR REPLACE) so the triggers see the old row leave
+            self.db.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+            self.db.execute(f"INSERT INTO documents ({', '.join(DOCUMENT_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                            tuple(document[column] for column in DOCUMENT_COLUMNS))
+            self.db.commit()
+        return document
+
+    def upsert_many(self, documents: Iterable[dict]) -> int:
+        # Bulk variant of upsert for backfilling, in one transaction
+        rows = [(document["doc_id"], document["name"], document.get("content_hash"), document["chunk_count"],
+                 document.get("size_bytes", 0), document.get("ingested_at") or time.time()) for document in documents]
+        with self.lock:
+            self.db.executemany("DELETE FROM documents WHERE doc_id = ?", [(row[0],) for row in rows])
+            self.db.executemany(f"INSERT INTO documents ({', '.join(DOCUMENT_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.db.commit()
+        return len(rows)
+
+    def delete(self, doc_id: str) -> bool:
+        with self.lock:
+            deleted = self.db.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,)).rowcount > 0
+            self.db.commit()
+        return deleted
+
+    def remove_chunks(self, doc_id: str, count: int = 1) -> None:
+        # Account for chunks deleted individually; the document goes once it has none left
+        with self.lock:
+            self.db.execute("UPDATE documents SET chunk_count = MAX(chunk_count - ?, 0) WHERE doc_id = ?", (count, doc_id))
+            self.db.execute("DELETE FROM documents WHERE doc_id = ? AND chunk_count = 0", (doc_id,))
+            self.db.commit()
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        with self.lock:
+            row = self.db.execute(f"SELECT {', '.join(DOCUMENT_COLUMNS)} FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return dict(zip(DOCUMENT_COLUMNS, row)) if row else None
+
+    def find_by_hash(self, content_hash: str) -> Optional[dict]:
+        with self.lock:
+            row = self.db.execute(f"SELECT {', '.join(DOCUMENT_COLUMNS)} FROM documents WHERE content_hash = ? LIMIT 1",
+                                  (content_hash,)).fetchone()
+        return dict(zip(DOCUMENT_COLUMNS, row)) if row else None
+
+    def list(self, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, name: Optional[str] = None,
+             content_hash: Optional[str] = None, since: Optional[float] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Returns up to `limit` documents, newest first, plus the cursor for the next page
+        or None. `name` matches a substring of the file name, `content_hash` an exact
+        hash and `since` documents ingested at or after that Unix time. Raises
+        ValueError for a malformed cursor.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        conditions, params = [], []
+        if cursor:
+            cursor_time, cursor_id = self._decode_cursor(cursor)
+            conditions.append("(ingested_at < ? OR (ingested_at = ? AND doc_id < ?))")
+            params += [cursor_time, cursor_time, cursor_id]
+        if name:
+            conditions.append("name LIKE ? ESCAPE '\\'")
+            params.append("%" + name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if content_hash:
+            conditions.append("content_hash = ?")
+            params.append(content_hash)
+        if since is not None:
+            conditions.append("ingested_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            rows = self.db.execute(f"SELECT {', '.join(DOCUMENT_COLUMNS)} FROM documents {where} "
+                                   f"ORDER BY ingested_at DESC, doc_id DESC LIMIT ?", (*params, limit + 1)).fetchall()
+        documents = [dict(zip(DOCUMENT_COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = self._encode_cursor(documents[-1]) if len(rows) > limit else None
+        return documents, next_cursor
+
+    def get_stats(self) -> Dict[str, object]:
+        # Totals maintained by the triggers, plus the latest ingest time from the index
+        with self.lock:
+            document_count, chunk_count, total_bytes = self.db.execute(
+                "SELECT document_count, chunk_count, total_bytes FROM document_stats WHERE id = 1").fetchone()
+            last_ingested_at = self.db.execute("SELECT MAX(ingested_at) FROM documents").fetchone()[0]
+        return {"document_count": document_count, "chunk_count": chunk_count, "total_bytes": total_bytes,
+                "last_ingested_at": last_ingested_at}
+
+    def get_version(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT version FROM store_version WHERE id = 1").fetchone()[0]
+
+    def bump_version(self) -> int:
+        # Record a change to the vector store and return the new version
+        with self.lock:
+            version = self.db.execute("UPDATE store_version SET version = version + 1 WHERE id = 1 RETURNING version").fetchone()[0]
+            self.db.commit()
+        return version
+
+    @staticmethod
+    def _encode_cursor(document: dict) -> str:
+        return f"{document['ingested_at']!r}~{document['doc_id']}"
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[float, str]:
+        ingested_at, separator, doc_id = cursor.partition("~")
+        if not separator:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        return float(ingested_at), doc_id
@@ -0,0 +1,86 @@
+import os
+import hashlib
+import logging
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Ingestion settings. Chunk sizes are in characters; embedding batches are in chunks.
+CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "200"))
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+# Text files are read in blocks of this many characters so large files are never fully loaded
+TEXT_BLOCK_SIZE = 64 * 1024
+
+def iter_pages(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+    """
+    Yields (page_number, text) for a document, one page at a time.
+    PDF pages are numbered from 1; plain text files are streamed in blocks with page None.
+    """
+    if file_path.lower().endswith(".pdf"):
+        # Imported here so processes that never parse PDFs do not load PyPDF2
+        from PyPDF2 import PdfReader
+        reader = PdfReader(file_path)
+        for page_number, page in enumerate(reader.pages, start=1):
+            try:
+                yield page_number, page.extract_text() or ""
+            except Exception as e:
+                logging.error(f"Error extracting text from page {page_number} of {file_path}: {e}")
+    else:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            while True:
+                block = f.read(TEXT_BLOCK_SIZE)
+                if not block:
+                    break
+                yield None, block
+
+def iter_chunks(pages: Iterable[Tuple[Optional[int], str]], chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[dict]:
+    """
+    Splits a stream of pages into overlapping chunks of at most chunk_size characters,
+    preferring to cut on whitespace. Chunks never span PDF pages, so each one keeps an
+    accurate page number. Yields dicts with "text", "page" and "chunk_index".
+    """
+    # Overlap must stay well below the minimum cut position so the buffer always advances
+    overlap = max(0, min(overlap, chunk_size // 4))
+    chunk_index = 0
+    buffer = ""
+    buffer_page = None
+    for page, text in pages:
+        if page != buffer_page:
+            if buffer.strip():
+                yield {"text": buffer.strip(), "page": buffer_page, "chunk_index": chunk_index}
+                chunk_index += 1
+            buffer = ""
+        buffer_page = page
+        buffer += text
+        while len(buffer) >= chunk_size:
+            cut = buffer.rfind(" ", chunk_size // 2, chunk_size)
+            if cut <= 0:
+                cut = chunk_size
+            chunk = buffer[:cut].strip()
+            if chunk:
+                yield {"text": chunk, "page": buffer_page, "chunk_index": chunk_index}
+                chunk_index += 1
+            buffer = buffer[cut - overlap:]
+    if buffer.strip():
+        yield {"text": buffer.strip(), "page": buffer_page, "chunk_index": chunk_index}
+
+def iter_batches(items: Iterable, batch_size: int = EMBED_BATCH_SIZE) -> Iterator[List]:
+    # Group a stream into lists of batch_size items (the last batch may be shorter)
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def file_sha256(file_path: str) -> str:
+    # Hash a file in blocks so large uploads are never fully loaded
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
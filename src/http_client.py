@@ -0,0 +1,45 @@
+import os
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Shared outbound connection pool settings. HTTP_POOL_SIZE bounds the keep-alive connections
+# kept per host; with HTTP_POOL_BLOCK callers wait for a free connection instead of opening more.
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "10"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_POOL_BLOCK = os.getenv("HTTP_POOL_BLOCK", "true").lower() in ("1", "true", "yes")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def create_session() -> requests.Session:
+    # Build a session whose adapters keep a bounded pool of keep-alive connections per host
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_SIZE, pool_block=HTTP_POOL_BLOCK)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+def get_session() -> requests.Session:
+    """
+    Returns the process-wide session shared by all outbound tool calls, so repeated
+    requests to NCBI and DuckDuckGo reuse TCP+TLS connections. A new session is created
+    after a fork, so pre-forking servers never share sockets between worker processes.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                _session = create_session()
+                _session_pid = os.getpid()
+                logging.info(f"Created shared HTTP session (pool size {HTTP_POOL_SIZE} per host) for process {_session_pid}.")
+    return _session
@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from chatbot_v3.src.document_processor import file_sha256
+from chatbot_v3.src.tool_orchestrator import VECTOR_STORE_PATH
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Background ingestion settings
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "32"))
+# Finished jobs are kept for progress polling until this many have accumulated
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "200"))
+# Job state lives in SQLite next to the document catalogue, so any worker process can report
+# on (and cancel) a job queued by another one
+INGEST_JOBS_FILE = "ingestion_jobs.sqlite3"
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled", "skipped")
+# Job fields kept in their own columns; everything else is stored in the JSON "data" column
+JOB_COLUMNS = ("job_id", "status", "content_hash", "pid", "cancel_requested", "created_at")
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class IngestionJobStore:
+    """
+    SQLite table of ingestion jobs shared by the worker processes on a host. Each job
+    row records the process that owns it; jobs left queued or running by a process
+    that has exited are marked failed when a store is opened. With no path the jobs
+    are kept in an in-memory database.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or ":memory:"
+        self.lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        if path:
+            self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS ingestion_jobs (job_id TEXT PRIMARY KEY, status TEXT NOT NULL, content_hash TEXT,
+                pid INTEGER NOT NULL, cancel_requested INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, data TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS ingestion_jobs_created_at ON ingestion_jobs (created_at);
+        """)
+        self.db.commit()
+        self._fail_orphaned_jobs()
+
+    def save(self, job: dict) -> None:
+        # Insert or update a job
+        data = json.dumps({key: value for key, value in job.items() if key not in JOB_COLUMNS})
+        with self.lock:
+            self.db.execute("INSERT INTO ingestion_jobs (job_id, status, content_hash, pid, created_at, data) VALUES (?, ?, ?, ?, ?, ?) "
+                            "ON CONFLICT (job_id) DO UPDATE SET status = excluded.status, data = excluded.data",
+                            (job["job_id"], job["status"], job.get("content_hash"), os.getpid(), job["created_at"], data))
+            self.db.commit()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self.lock:
+            row = self.db.execute(f"SELECT {', '.join(JOB_COLUMNS)}, data FROM ingestion_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def list(self, limit: int = INGEST_JOB_HISTORY) -> List[dict]:
+        # Most recent jobs first
+        with self.lock:
+            rows = self.db.execute(f"SELECT {', '.join(JOB_COLUMNS)}, data FROM ingestion_jobs ORDER BY created_at DESC LIMIT ?",
+                                   (limit,)).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def request_cancel(self, job_id: str) -> None:
+        with self.lock:
+            self.db.execute("UPDATE ingestion_jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+            self.db.commit()
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self.lock:
+            row = self.db.execute("SELECT cancel_requested FROM ingestion_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def prune(self, keep: int = INGEST_JOB_HISTORY) -> None:
+        # Drop the oldest finished jobs beyond the history limit
+        placeholders = ", ".join("?" * len(FINISHED_STATUSES))
+        with self.lock:
+            self.db.execute(f"DELETE FROM ingestion_jobs WHERE job_id IN (SELECT job_id FROM ingestion_jobs WHERE status IN ({placeholders}) "
+                            f"ORDER BY created_at DESC LIMIT -1 OFFSET ?)", (*FINISHED_STATUSES, keep))
+            self.db.commit()
+
+    def _fail_orphaned_jobs(self) -> None:
+        # Jobs whose owning process is gone will never finish
+        with self.lock:
+            rows = self.db.execute(f"SELECT {', '.join(JOB_COLUMNS)}, data FROM ingestion_jobs WHERE status IN ('queued', 'running')").fetchall()
+        for job in map(self._to_job, rows):
+            if job["pid"] != os.getpid() and not _process_alive(job["pid"]):
+                job.update(status="failed", finished_at=time.time(), errors=job["errors"] + ["Worker process exited before the job finished"])
+                with self.lock:
+                    self.db.execute("UPDATE ingestion_jobs SET status = ?, data = ? WHERE job_id = ?",
+                                    (job["status"], json.dumps({key: value for key, value in job.items() if key not in JOB_COLUMNS}), job["job_id"]))
+                    self.db.commit()
+
+    @staticmethod
+    def _to_job(row) -> dict:
+        job = dict(zip(JOB_COLUMNS, row[:-1]))
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        job.update(json.loads(row[-1]))
+        return job
+
+class IngestionQueue:
+    """
+    Runs document ingestion on a pool of background worker threads fed by a bounded
+    queue, so uploads return a job ID immediately instead of holding a request worker
+    for the whole parse and embed. Job progress (pages parsed, chunks embedded, errors)
+    is recorded in an IngestionJobStore that every worker process can read, queued or
+    running jobs can be cancelled from any process, and files whose content hash is
+    already indexed are skipped.
+    """
+    def __init__(self, orchestrator, workers: int = INGEST_WORKERS, max_queue_size: int = INGEST_QUEUE_SIZE,
+                 jobs_path: Optional[str] = None):
+        self.orchestrator = orchestrator
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        if jobs_path is None and VECTOR_STORE_PATH:
+            jobs_path = os.path.join(VECTOR_STORE_PATH, INGEST_JOBS_FILE)
+        try:
+            self.store = IngestionJobStore(jobs_path)
+        except sqlite3.Error as e:
+            logging.error(f"Error opening ingestion job store at {jobs_path}, keeping jobs in memory: {e}")
+            self.store = IngestionJobStore()
+        self.jobs: Dict[str, dict] = {}  # unfinished jobs owned by this process
+        self.cancel_events: Dict[str, threading.Event] = {}
+        self.active_hashes: Dict[str, str] = {}  # content hash -> job ID of queued or running jobs
+        self.lock = threading.Lock()
+        self.workers = [threading.Thread(target=self._worker, name=f"ingest-{i}", daemon=True) for i in range(workers)]
+        for worker in self.workers:
+            worker.start()
+        logging.info(f"IngestionQueue started with {workers} workers (queue size {max_queue_size}).")
+
+    def submit(self, file_path: str, source: Optional[str] = None) -> dict:
+        """
+        Queues a saved file for ingestion and returns its job dict. Duplicate content is
+        returned as a "skipped" job; raises queue.Full when the queue is at capacity.
+        """
+        source = source or os.path.basename(file_path)
+        content_hash = file_sha256(file_path)
+        job = {"job_id": uuid.uuid4().hex, "source": source, "file_path": file_path, "content_hash": content_hash, "status": "queued",
+               "pages": 0, "chunks": 0, "errors": [], "created_at": time.time(), "started_at": None, "finished_at": None}
+        with self.lock:
+            duplicate_job = self.active_hashes.get(content_hash)
+        duplicate_source = None if duplicate_job else self.orchestrator.find_document_by_hash(content_hash)
+        with self.lock:
+            duplicate_job = duplicate_job or self.active_hashes.get(content_hash)
+            if duplicate_job or duplicate_source:
+                job.update(status="skipped", finished_at=time.time(), duplicate_of=duplicate_job or duplicate_source)
+                logging.info(f"Skipping ingestion of {source}: content already {'queued' if duplicate_job else 'indexed'} as {job['duplicate_of']}.")
+                self.store.save(job)
+                self.store.prune()
+                return self._public(job)
+            self.queue.put_nowait(job["job_id"])
+            self.jobs[job["job_id"]] = job
+            self.active_hashes[content_hash] = job["job_id"]
+            self.cancel_events[job["job_id"]] = threading.Event()
+            self.store.save(job)
+        return self.get_job(job["job_id"])
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        job = self.store.get(job_id)
+        return self._public(job) if job else None
+
+    def list_jobs(self) -> List[dict]:
+        return [self._public(job) for job in self.store.list()]
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        # Request cancellation; queued jobs are dropped, running jobs stop after the current batch.
+        # Jobs owned by another process are flagged in the store and stopped by that process.
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job:
+                self.cancel_events[job_id].set()
+                if job["status"] == "queued":
+                    self._finish(job, "cancelled")
+        if not job:
+            stored = self.store.get(job_id)
+            if not stored:
+                return None
+            if stored["status"] not in FINISHED_STATUSES:
+                self.store.request_cancel(job_id)
+        return self.get_job(job_id)
+
+    def _worker(self) -> None:
+        while True:
+            job_id = self.queue.get()
+            try:
+                self._run(job_id)
+            finally:
+                self.queue.task_done()
+
+    def _run(self, job_id: str) -> None:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job["status"] != "queued":
+                return
+            cancel_event = self.cancel_events[job_id]
+            if self.store.cancel_requested(job_id):
+                self._finish(job, "cancelled")
+                return
+            job.update(status="running", started_at=time.time())
+            self.store.save(job)
+
+        def progress(stats: dict) -> None:
+            with self.lock:
+                job.update(pages=stats["pages"], chunks=stats["chunks"])
+                self.store.save(job)
+
+        def should_cancel() -> bool:
+            return cancel_event.is_set() or self.store.cancel_requested(job_id)
+
+        try:
+            stats = self.orchestrator.ingest_document(job["file_path"], source=job["source"], content_hash=job["content_hash"],
+                                                      progress=progress, should_cancel=should_cancel)
+            with self.lock:
+                job.update(pages=stats["pages"], chunks=stats["chunks"], chunks_per_sec=stats["chunks_per_sec"])
+                self._finish(job, "cancelled" if stats["cancelled"] else "completed")
+        except Exception as e:
+            logging.error(f"Error ingesting {job['source']} (job {job_id}): {e}")
+            with self.lock:
+                job["errors"].append(f"{type(e).__name__}: {e}")
+                self._finish(job, "failed")
+
+    def _finish(self, job: dict, status: str) -> None:
+        # Mark a job finished, record it and release its content hash (lock held)
+        job.update(status=status, finished_at=time.time())
+        self.jobs.pop(job["job_id"], None)
+        self.cancel_events.pop(job["job_id"], None)
+        if self.active_hashes.get(job["content_hash"]) == job["job_id"]:
+            del self.active_hashes[job["content_hash"]]
+        self.store.save(job)
+        self.store.prune()
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        # The job as reported by the API, without server-side details
+        return {key: value for key, value in job.items() if key not in ("file_path", "pid")}
@@ -0,0 +1,157 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Latency histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    "chatbot_stage_duration_seconds": "Latency of each pipeline stage.",
+    "chatbot_stage_errors_total": "Pipeline stages that raised an error or returned an error result.",
+    "chatbot_stage_in_flight": "Pipeline stages currently executing.",
+    "chatbot_tool_results_total": "Completed tool calls by result status (ok, empty or error).",
+    "chatbot_tool_timeouts_total": "Tool calls abandoned after missing their deadline.",
+    "chatbot_tool_abandoned_total": "Tool calls abandoned because the caller stopped waiting, e.g. after an early exit.",
+    "chatbot_early_exits_total": "Requests that skipped still-running tools once the context was sufficient.",
+    "chatbot_early_exit_saved_seconds": "Time abandoned tools kept running after an early exit, i.e. tail latency saved.",
+    "chatbot_early_exit_candidates_total": "Requests whose context the evaluator found sufficient before every tool finished.",
+    "chatbot_early_exit_potential_seconds": "Time spent waiting for the remaining tools after the context was sufficient, with EARLY_TERMINATION off.",
+    "chatbot_cache_lookups_total": "Cache lookups by result (hit or miss).",
+    "chatbot_cache_hit_ratio": "Fraction of cache lookups that were hits.",
+    "chatbot_cache_entries": "Entries currently held by each cache tier.",
+    "chatbot_rate_limit_wait_seconds": "Time outbound calls waited for a rate limit token.",
+    "chatbot_rate_limit_timeouts_total": "Outbound calls that gave up waiting for a rate limit token.",
+    "chatbot_circuit_state": "Circuit breaker state per backend (0 closed, 1 half-open, 2 open).",
+    "chatbot_circuit_rejections_total": "Outbound calls rejected without being sent because the backend's circuit was open.",
+    "chatbot_singleflight_shared_total": "Outbound calls that reused the result of an identical in-flight call.",
+    "chatbot_web_pages_total": "Web search result pages by enrichment outcome (fetched, cached, revalidated, skipped or over budget).",
+    "chatbot_startup_seconds": "Time spent importing heavy dependencies and constructing the orchestrator and each tool.",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+class MetricsRegistry:
+    """
+    Thread-safe in-process metrics: latency histograms, counters and gauges keyed by
+    metric name and labels, rendered in the Prometheus text exposition format.
+    Collectors registered with add_collector run before each render to refresh values
+    that are owned elsewhere, such as cache hit counters.
+    """
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Dict[LabelKey, list]] = {}  # name -> labels -> [bucket counts..., sum, count]
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self.collectors: List[Callable[["MetricsRegistry"], None]] = []
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        # Record a value in a histogram
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            key = self._key(labels)
+            if key not in series:
+                series[key] = [0] * len(self.buckets) + [0.0, 0]
+            row = series[key]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[index] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            key = self._key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set_counter(self, name: str, value: float, **labels) -> None:
+        # Set a counter whose running total is maintained elsewhere
+        with self.lock:
+            self.counters.setdefault(name, {})[self._key(labels)] = value
+
+    def add_gauge(self, name: str, amount: float, **labels) -> None:
+        with self.lock:
+            series = self.gauges.setdefault(name, {})
+            key = self._key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self.lock:
+            self.gauges.setdefault(name, {})[self._key(labels)] = value
+
+    def add_collector(self, collector: Callable[["MetricsRegistry"], None]) -> None:
+        self.collectors.append(collector)
+
+    @contextmanager
+    def timed(self, stage: str, timings: Optional[dict] = None, **labels):
+        """
+        Times a pipeline stage: tracks it as in flight, records its latency in the
+        stage histogram and counts an error if it raises. If `timings` is given, the
+        elapsed seconds are also added to it under the stage name (plus any labels),
+        to build a per-request breakdown.
+        """
+        labels = {"stage": stage, **labels}
+        self.add_gauge("chatbot_stage_in_flight", 1, **labels)
+        start = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.inc("chatbot_stage_errors_total", **labels)
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            self.add_gauge("chatbot_stage_in_flight", -1, **labels)
+            self.observe("chatbot_stage_duration_seconds", elapsed, **labels)
+            if timings is not None:
+                key = ":".join([stage, *(str(value) for name, value in labels.items() if name != "stage")])
+                timings[key] = round(timings.get(key, 0) + elapsed, 6)
+
+    def render_prometheus(self) -> str:
+        # Render all metrics in the Prometheus text exposition format (version 0.0.4)
+        for collector in self.collectors:
+            try:
+                collector(self)
+            except Exception as e:
+                logging.error(f"Error running metrics collector: {e}")
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.histograms.items()):
+                self._header(lines, name, "histogram")
+                for key, row in sorted(series.items()):
+                    for index, bound in enumerate(self.buckets):
+                        lines.append(f"{name}_bucket{self._format(key + (('le', repr(bound)),))} {row[index]}")
+                    lines.append(f"{name}_bucket{self._format(key + (('le', '+Inf'),))} {row[-1]}")
+                    lines.append(f"{name}_sum{self._format(key)} {row[-2]}")
+                    lines.append(f"{name}_count{self._format(key)} {row[-1]}")
+            for metric_type, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+                for name, series in sorted(metrics.items()):
+                    self._header(lines, name, metric_type)
+                    for key, value in sorted(series.items()):
+                        lines.append(f"{name}{self._format(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _key(labels: dict) -> LabelKey:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    @staticmethod
+    def _format(key: LabelKey) -> str:
+        if not key:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in key)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + "}"
+
+    @staticmethod
+    def _header(lines: list, name: str, metric_type: str) -> None:
+        if name in METRIC_HELP:
+            lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+        lines.append(f"# TYPE {name} {metric_type}")
+
+# Process-wide registry used by the agents, the orchestrator and the /metrics route
+METRICS = MetricsRegistry()
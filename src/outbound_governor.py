@@ -0,0 +1,252 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+
+from chatbot_v3.src.metrics import METRICS
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Outbound rate limits in requests per second. NCBI allows 3/s per host without an API key
+# and 10/s with one; a rate of 0 disables limiting. With RATE_LIMIT_PATH set the token
+# buckets live in a SQLite file, so all worker processes on the host share one budget.
+NCBI_RATE_LIMIT = float(os.getenv("NCBI_RATE_LIMIT", "10" if os.getenv("NCBI_API_KEY") else "3"))
+WEB_SEARCH_RATE_LIMIT = float(os.getenv("WEB_SEARCH_RATE_LIMIT", "0"))
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", os.path.join("cache", "rate_limits.sqlite3"))
+# Longest a call waits for a token before failing instead
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "5"))
+# A backend's circuit opens after this many consecutive failures and lets a trial call
+# through after CIRCUIT_RESET_TIMEOUT seconds
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit is open."""
+
+class RateLimitTimeout(RuntimeError):
+    """Raised when no rate limit token becomes available within the maximum wait."""
+
+def is_backend_failure(error: Exception) -> bool:
+    # Connection errors, timeouts, 5xx and 429 mean the backend is unhealthy; other 4xx do not
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return isinstance(error, requests.exceptions.RequestException)
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter allowing `rate` calls per second with bursts of up to
+    `capacity` (one by default, so calls are evenly spaced as NCBI expects). With a
+    SQLite path the bucket state is a row in a shared table updated inside an IMMEDIATE
+    transaction, so every worker process on the host draws from the same budget;
+    without one (or if the file cannot be opened) it is process-local. A call that hits a
+    SQLite error uses the process-local bucket and the next call tries the file again.
+    """
+    def __init__(self, name: str, rate: float, capacity: Optional[float] = None, path: Optional[str] = RATE_LIMIT_PATH):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity or 1.0
+        self.lock = threading.Lock()
+        self.tokens = self.capacity
+        self.updated_at = time.time()
+        self.db = None
+        if path and rate > 0:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                # Autocommit mode, so transactions are only the explicit BEGIN IMMEDIATE ones
+                self.db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+                self.db.execute("PRAGMA journal_mode=WAL")
+                self.db.execute("CREATE TABLE IF NOT EXISTS rate_limits (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+            except sqlite3.Error as e:
+                logging.error(f"Error opening rate limit store at {path}, limiting {name} per process: {e}")
+                self.db = None
+
+    def acquire(self, max_wait: float = RATE_LIMIT_MAX_WAIT) -> float:
+        """
+        Takes one token, sleeping until one is available, and returns the seconds waited.
+        Raises RateLimitTimeout if that would take longer than `max_wait`.
+        """
+        if self.rate <= 0:
+            return 0.0
+        start = time.monotonic()
+        while True:
+            wait = self._try_take()
+            waited = time.monotonic() - start
+            if wait <= 0:
+                METRICS.observe("chatbot_rate_limit_wait_seconds", waited, bucket=self.name)
+                return waited
+            if waited + wait > max_wait:
+                METRICS.inc("chatbot_rate_limit_timeouts_total", bucket=self.name)
+                raise RateLimitTimeout(f"{self.name} rate limit ({self.rate:g}/s) not available within {max_wait:g}s")
+            time.sleep(wait)
+
+    def _try_take(self) -> float:
+        # Take a token if one is available and return 0, otherwise the seconds until the next one
+        with self.lock:
+            now = time.time()
+            if self.db:
+                try:
+                    self.db.execute("BEGIN IMMEDIATE")
+                    row = self.db.execute("SELECT tokens, updated_at FROM rate_limits WHERE name = ?", (self.name,)).fetchone()
+                    tokens, wait = self._refill(*(row or (self.capacity, now)), now)
+                    self.db.execute("INSERT OR REPLACE INTO rate_limits (name, tokens, updated_at) VALUES (?, ?, ?)", (self.name, tokens, now))
+                    self.db.execute("COMMIT")
+                    return wait
+                except sqlite3.Error as e:
+                    # Fall back to the process-local bucket for this call only; the next call
+                    # tries the shared store again, so a transient error does not split the budget
+                    logging.error(f"Error updating shared rate limit for {self.name}, limiting this call per process: {e}")
+                    try:
+                        if self.db.in_transaction:
+                            self.db.execute("ROLLBACK")
+                    except sqlite3.Error:
+                        pass
+            self.tokens, wait = self._refill(self.tokens, self.updated_at, now)
+            self.updated_at = now
+            return wait
+
+    def _refill(self, tokens: float, updated_at: float, now: float) -> Tuple[float, float]:
+        # Add the tokens earned since the last update, then take one if there is one
+        tokens = min(self.capacity, tokens + max(0.0, now - updated_at) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, 0.0
+        return tokens, (1 - tokens) / self.rate
+
+class CircuitBreaker:
+    """
+    Per-backend circuit breaker. After `failure_threshold` consecutive failures the
+    circuit opens and calls fail fast with CircuitOpenError; after `reset_timeout`
+    seconds a single trial call is let through (half-open) and its outcome closes or
+    re-opens the circuit.
+    """
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        METRICS.set_gauge("chatbot_circuit_state", CIRCUIT_STATES[self.state], backend=name)
+
+    def before_call(self) -> None:
+        # Raise CircuitOpenError unless a call may go through now
+        with self.lock:
+            if self.state == "open":
+                remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+                if remaining > 0:
+                    METRICS.inc("chatbot_circuit_rejections_total", backend=self.name)
+                    raise CircuitOpenError(f"{self.name} is unavailable after {self.failures} consecutive failures; retrying in {remaining:.1f}s")
+                self._set_state("half_open")
+            if self.state == "half_open":
+                if self.trial_in_flight:
+                    METRICS.inc("chatbot_circuit_rejections_total", backend=self.name)
+                    raise CircuitOpenError(f"{self.name} is unavailable; a trial call is in progress")
+                self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.trial_in_flight = False
+            if self.state != "closed":
+                logging.info(f"Circuit for {self.name} closed; backend is healthy again.")
+                self._set_state("closed")
+
+    def record_failure(self, error: Exception) -> None:
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                logging.warning(f"Circuit for {self.name} opened after {self.failures} consecutive failures (last: {error}).")
+                self.opened_at = time.monotonic()
+                self._set_state("open")
+
+    def release(self) -> None:
+        # Give up a trial slot taken by before_call without recording an outcome
+        with self.lock:
+            self.trial_in_flight = False
+
+    def _set_state(self, state: str) -> None:
+        # (lock held)
+        self.state = state
+        METRICS.set_gauge("chatbot_circuit_state", CIRCUIT_STATES[state], backend=self.name)
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key runs the function
+    and every caller that arrives while it is in flight waits for and shares its result
+    (or exception) instead of making its own upstream call.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls: Dict[str, dict] = {}  # key -> {"done": Event, "result" or "error"}
+
+    def do(self, key: str, fn: Callable[[], object]):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {"done": threading.Event()}
+        if not leader:
+            call["done"].wait()
+            METRICS.inc("chatbot_singleflight_shared_total", backend=self.name)
+            if "error" in call:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+            call["done"].set()
+
+class OutboundGovernor:
+    """
+    Guards calls to one external backend: identical concurrent calls are coalesced,
+    calls fail fast while the backend's circuit is open, and the rest wait for a
+    rate limit token before going out.
+    """
+    def __init__(self, name: str, rate: float, path: Optional[str] = RATE_LIMIT_PATH):
+        self.name = name
+        self.limiter = TokenBucket(name, rate, path=path)
+        self.breaker = CircuitBreaker(name)
+        self.single_flight = SingleFlight(name)
+
+    def call(self, key: str, fn: Callable[[], object]):
+        """
+        Runs fn() under the governor and returns its result. Callers with the same
+        key at the same time share one call, so fn should return plain data rather
+        than objects that cannot be read by several threads (e.g. a streamed response).
+        """
+        return self.single_flight.do(key, lambda: self._call(fn))
+
+    def _call(self, fn: Callable[[], object]):
+        self.breaker.before_call()
+        try:
+            self.limiter.acquire()
+        except RateLimitTimeout:
+            self.breaker.release()
+            raise
+        try:
+            result = fn()
+        except Exception as e:
+            if is_backend_failure(e):
+                self.breaker.record_failure(e)
+            else:
+                # The backend answered; the error is ours (e.g. unparseable content)
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return result
@@ -1,128 +1,1110 @@
-import chromadb
+import io
 import os
+import sys
+import json
+import hashlib
+import time
+import uuid
+import sqlite3
 import logging
-from typing import List
-from Bio import Entrez
+import importlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterator, List, Optional
 import requests
 
+try:
+    import fcntl
+except ImportError:  # Windows: writer processes are not coordinated
+    fcntl = None
+
+from chatbot_v3.src.metrics import METRICS
+from chatbot_v3.src.http_client import get_session, HTTP_TIMEOUT
+from chatbot_v3.src.bm25_index import BM25Index
+from chatbot_v3.src.document_processor import iter_pages, iter_chunks, iter_batches, EMBED_BATCH_SIZE
+from chatbot_v3.src.document_catalog import DocumentCatalog, DOCUMENT_CATALOG_FILE, DEFAULT_PAGE_SIZE
+from chatbot_v3.src.web_pages import PageSkipped, parse_search_results, fetch_page, extract_main_text
+from chatbot_v3.src.outbound_governor import (OutboundGovernor, CircuitOpenError, RateLimitTimeout,
+                                              NCBI_RATE_LIMIT, WEB_SEARCH_RATE_LIMIT)
+
 # Configure basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Only the PubMed tool needs this; it is checked when that tool is first used, not at import
 ENTREZ_EMAIL = os.getenv("ENTREZ_EMAIL")
-if not ENTREZ_EMAIL:
-    raise ValueError("ENTREZ_EMAIL environment variable not set.")
-Entrez.email = ENTREZ_EMAIL
+# E-utilities are called through the shared HTTP session; the base URLs can point at a local stub server
+EUTILS_BASE_URL = os.getenv("EUTILS_BASE_URL", "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/")
+NCBI_API_KEY = os.getenv("NCBI_API_KEY")
+WEB_SEARCH_URL = os.getenv("WEB_SEARCH_URL", "https://html.duckduckgo.com/html/")
+# Number of web search results returned per query
+WEB_SEARCH_RESULTS = int(os.getenv("WEB_SEARCH_RESULTS", "3"))
+# Optional enrichment: fetch the result pages concurrently and use their main text instead of
+# the search snippet. Each page is cut off at WEB_PAGE_MAX_BYTES and WEB_PAGE_TIMEOUT seconds,
+# and the search waits at most WEB_ENRICH_BUDGET seconds for all pages together.
+WEB_ENRICH = os.getenv("WEB_ENRICH", "false").lower() in ("1", "true", "yes")
+WEB_PAGE_MAX_BYTES = int(os.getenv("WEB_PAGE_MAX_BYTES", str(1024 * 1024)))
+WEB_PAGE_TIMEOUT = float(os.getenv("WEB_PAGE_TIMEOUT", "3"))
+WEB_ENRICH_BUDGET = float(os.getenv("WEB_ENRICH_BUDGET", "4"))
+WEB_PAGE_MAX_CHARS = int(os.getenv("WEB_PAGE_MAX_CHARS", "2000"))
+WEB_PAGE_WORKERS = int(os.getenv("WEB_PAGE_WORKERS", "8"))
+# Extracted page text is cached by URL and revalidated with ETag/Last-Modified once older than
+# WEB_PAGE_FRESH_TTL; entries are dropped entirely after WEB_PAGE_CACHE_TTL
+WEB_PAGE_CACHE_PATH = os.getenv("WEB_PAGE_CACHE_PATH", os.path.join("cache", "web_page_cache.sqlite3"))
+WEB_PAGE_FRESH_TTL = float(os.getenv("WEB_PAGE_FRESH_TTL", str(60 * 60)))
+WEB_PAGE_CACHE_TTL = float(os.getenv("WEB_PAGE_CACHE_TTL", str(7 * 24 * 60 * 60)))
+WEB_PAGE_MEMORY_ENTRIES = int(os.getenv("WEB_PAGE_MEMORY_ENTRIES", "256"))
+WEB_PAGE_CACHE_ENTRIES = int(os.getenv("WEB_PAGE_CACHE_ENTRIES", "10000"))
+# Maximum number of PubMed articles fetched per query (all fetched in one efetch call)
+PUBMED_RETMAX = int(os.getenv("PUBMED_RETMAX", "5"))
+
+# PubMed cache settings. Query -> PMID lists expire quickly; PMID -> article entries live long.
+# Set PUBMED_CACHE_PATH to an empty string to keep the cache in memory only.
+PUBMED_CACHE_PATH = os.getenv("PUBMED_CACHE_PATH", os.path.join("cache", "pubmed_cache.sqlite3"))
+PUBMED_QUERY_TTL = float(os.getenv("PUBMED_QUERY_TTL", str(60 * 60)))
+PUBMED_ARTICLE_TTL = float(os.getenv("PUBMED_ARTICLE_TTL", str(30 * 24 * 60 * 60)))
+PUBMED_CACHE_MEMORY_ENTRIES = int(os.getenv("PUBMED_CACHE_MEMORY_ENTRIES", "1024"))
+PUBMED_CACHE_DISK_ENTRIES = int(os.getenv("PUBMED_CACHE_DISK_ENTRIES", "100000"))
+
+# Vector store settings. With VECTOR_STORE_PATH set (the default) the collection is persisted
+# on disk and shared by all worker processes; set it to an empty string for an in-memory store.
+# Workers started with VECTOR_STORE_READ_ONLY=true never write to the store.
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "vector_store")
+VECTOR_STORE_COLLECTION = os.getenv("VECTOR_STORE_COLLECTION", "my_collection")
+VECTOR_STORE_READ_ONLY = os.getenv("VECTOR_STORE_READ_ONLY", "false").lower() in ("1", "true", "yes")
+VECTOR_STORE_N_RESULTS = int(os.getenv("VECTOR_STORE_N_RESULTS", "2"))
+# Chroma keeps each process's view of a persisted collection in memory. A process checks the
+# shared vector store version at most this often (seconds) and reopens the collection when
+# another process has changed it.
+VECTOR_STORE_RELOAD_INTERVAL = float(os.getenv("VECTOR_STORE_RELOAD_INTERVAL", "2"))
+# Retrieval mode for the VectorStore tool: "dense" (Chroma only), "lexical" (BM25 only, no
+# embedding call) or "hybrid" (both, merged with reciprocal rank fusion)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+# Each retriever contributes this many candidates per result to the fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "5"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+LEXICAL_INDEX_FILE = "bm25_index.pkl"
+SAMPLE_DOCUMENTS = [
+    "Alzheimer's disease is a progressive neurodegenerative disorder.",
+    "New treatments for Alzheimer's are being developed.",
+    "Early diagnosis is crucial for managing Alzheimer's disease."
+]
+
+# Concurrent tool execution settings. Each tool gets its own deadline (seconds);
+# a tool that misses it is reported as timed out and the remaining results are returned.
+CONCURRENT_TOOLS = os.getenv("CONCURRENT_TOOLS", "true").lower() in ("1", "true", "yes")
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "12"))
+TOOL_TIMEOUTS = {
+    "VectorStore": float(os.getenv("VECTOR_STORE_TIMEOUT", "5")),
+    "PubMed": float(os.getenv("PUBMED_TIMEOUT", str(DEFAULT_TOOL_TIMEOUT))),
+    "WebSearch": float(os.getenv("WEB_SEARCH_TIMEOUT", str(DEFAULT_TOOL_TIMEOUT))),
+}
+# The pool is shared by every request in the process, so by default it has a thread for each
+# tool of each concurrently served request (GUNICORN_THREADS request threads) and a request's
+# tools never queue behind another request's
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "0")) or int(os.getenv("GUNICORN_THREADS", "8")) * len(TOOL_TIMEOUTS)
+# A tool's deadline starts when it starts running; one still waiting for a pool thread after
+# this many seconds is reported as timed out instead
+TOOL_QUEUE_TIMEOUT = float(os.getenv("TOOL_QUEUE_TIMEOUT", str(DEFAULT_TOOL_TIMEOUT)))
+# Comma-separated tools (or "all") to construct in a background thread when the orchestrator
+# starts, so the first request does not pay for their imports and setup
+TOOL_WARMUP = [tool.strip() for tool in os.getenv("TOOL_WARMUP", "").split(",") if tool.strip()]
+
+def lazy_import(module_name: str):
+    """
+    Imports a heavy optional dependency on first use and records how long the import
+    took in the chatbot_startup_seconds gauge, so startup cost shows up in /metrics.
+    """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    start = time.monotonic()
+    module = importlib.import_module(module_name)
+    elapsed = time.monotonic() - start
+    METRICS.set_gauge("chatbot_startup_seconds", elapsed, phase="import", component=module_name)
+    logging.info(f"Imported {module_name} in {elapsed:.2f}s.")
+    return module
+
+def _load_entrez():
+    # Biopython is only needed to parse E-utilities XML, so it is imported on the first PubMed call
+    if not ENTREZ_EMAIL:
+        raise ValueError("ENTREZ_EMAIL environment variable not set.")
+    entrez = lazy_import("Bio.Entrez")
+    entrez.email = ENTREZ_EMAIL
+    return entrez
+
+# Tool registry: tool name -> factory called with the orchestrator the first time the tool is
+# used. The factory does the tool's expensive setup (imports, opening stores) and returns the
+# function that answers a query with a result dict ("contents", "sources", "passages", and
+# "status": "error" when the backend failed or "empty" when nothing was found).
+TOOL_FACTORIES: Dict[str, Callable[["ToolOrchestrator"], Callable[[str], dict]]] = {}
+
+def register_tool(name: str, factory: Optional[Callable[["ToolOrchestrator"], Callable[[str], dict]]] = None):
+    """
+    Registers a tool factory under `name`, replacing any earlier one. Can be used
+    directly or as a decorator: @register_tool("MyTool").
+    """
+    if factory is None:
+        return lambda factory: register_tool(name, factory)
+    TOOL_FACTORIES[name] = factory
+    return factory
+
+@register_tool("VectorStore")
+def _vector_store_tool(orchestrator: "ToolOrchestrator") -> Callable[[str], dict]:
+    # Open the store up front so its cost is attributed to tool setup, not the first query
+    orchestrator.collection
+    return orchestrator.query_vector_store
+
+@register_tool("PubMed")
+def _pubmed_tool(orchestrator: "ToolOrchestrator") -> Callable[[str], dict]:
+    _load_entrez()
+    return orchestrator.query_pubmed
+
+@register_tool("WebSearch")
+def _web_search_tool(orchestrator: "ToolOrchestrator") -> Callable[[str], dict]:
+    lazy_import("bs4")
+    return orchestrator.perform_web_search
+
+def source_key(source: str) -> str:
+    # Stable document ID for a source name; chunk IDs are "<source key>-<generation>-<chunk index>"
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+
+class TieredCache:
+    """
+    Two-tier key/value cache: an in-process LRU in front of an optional SQLite table.
+    Entries expire after `ttl` seconds; each tier evicts its least recently used
+    entries once it holds more than its size bound. Values must be JSON serializable.
+    The SQLite file can be shared by several worker processes and survives restarts.
+    """
+    def __init__(self, name: str, ttl: float, memory_entries: int = 1024, disk_entries: int = 100000, path: Optional[str] = None):
+        self.name = name
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self.db = None
+        if path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+                self.db.execute("PRAGMA journal_mode=WAL")
+                self.db.execute(f"CREATE TABLE IF NOT EXISTS {name} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+                self.db.execute(f"CREATE INDEX IF NOT EXISTS {name}_accessed_at ON {name} (accessed_at)")
+                self.db.commit()
+            except sqlite3.Error as e:
+                logging.error(f"Error opening {name} cache at {path}, using memory only: {e}")
+                self.db = None
+
+    def get(self, key: str):
+        # Return the cached value for key, or None on a miss
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: List[str]) -> dict:
+        # Return a dict of key -> value for the keys that are cached and not expired
+        now = time.time()
+        found = {}
+        with self.lock:
+            missing = []
+            for key in keys:
+                entry = self.memory.get(key)
+                if entry and entry[1] > now:
+                    self.memory.move_to_end(key)
+                    found[key] = entry[0]
+                    self.stats["memory_hits"] += 1
+                else:
+                    self.memory.pop(key, None)
+                    missing.append(key)
+            if missing and self.db:
+                try:
+                    placeholders = ",".join("?" * len(missing))
+                    rows = self.db.execute(f"SELECT key, value, expires_at FROM {self.name} WHERE key IN ({placeholders}) AND expires_at > ?",
+                                           (*missing, now)).fetchall()
+                    if rows:
+                        self.db.execute(f"UPDATE {self.name} SET accessed_at = ? WHERE key IN ({','.join('?' * len(rows))})",
+                                        (now, *[row[0] for row in rows]))
+                        self.db.commit()
+                    for key, value, expires_at in rows:
+                        found[key] = json.loads(value)
+                        self._remember(key, found[key], expires_at)
+                        self.stats["disk_hits"] += 1
+                except sqlite3.Error as e:
+                    logging.error(f"Error reading {self.name} cache: {e}")
+            self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    def set(self, key: str, value) -> None:
+        self.set_many({key: value})
+
+    def set_many(self, items: dict) -> None:
+        # Store key -> value pairs in both tiers
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + self.ttl
+        with self.lock:
+            for key, value in items.items():
+                self._remember(key, value, expires_at)
+            if self.db:
+                try:
+                    self.db.executemany(f"INSERT OR REPLACE INTO {self.name} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                                        [(key, json.dumps(value), expires_at, now) for key, value in items.items()])
+                    self._evict_disk(now)
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    logging.error(f"Error writing {self.name} cache: {e}")
+
+    def clear(self) -> None:
+        with self.lock:
+            self.memory.clear()
+            if self.db:
+                self.db.execute(f"DELETE FROM {self.name}")
+                self.db.commit()
+
+    def get_stats(self) -> dict:
+        # Hit/miss counters plus current tier sizes
+        with self.lock:
+            stats = dict(self.stats, memory_size=len(self.memory))
+            if self.db:
+                stats["disk_size"] = self.db.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key: str, value, expires_at: float) -> None:
+        # Insert into the in-process LRU tier, evicting the oldest entries if full
+        self.memory[key] = (value, expires_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _evict_disk(self, now: float) -> None:
+        # Drop expired rows, then the least recently used rows above the size bound
+        self.db.execute(f"DELETE FROM {self.name} WHERE expires_at <= ?", (now,))
+        overflow = self.db.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0] - self.disk_entries
+        if overflow > 0:
+            self.db.execute(f"DELETE FROM {self.name} WHERE key IN (SELECT key FROM {self.name} ORDER BY accessed_at LIMIT ?)", (overflow,))
+            self.stats["evictions"] += overflow
 
 class ToolOrchestrator:
-    def __init__(self):
+    def __init__(self, embedding_function=None):
         # Initialize the Tool Orchestrator
+        # embedding_function overrides the default Chroma embedding model (e.g. for offline benchmarks)
+        start = time.monotonic()
+        # Shared worker pool used to fan out tool calls concurrently
+        self.executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool")
+        # Two-level PubMed cache: query -> PMID list, PMID -> parsed title/abstract
+        self.pubmed_query_cache = TieredCache("pubmed_queries", PUBMED_QUERY_TTL, PUBMED_CACHE_MEMORY_ENTRIES,
+                                              PUBMED_CACHE_DISK_ENTRIES, PUBMED_CACHE_PATH)
+        self.pubmed_article_cache = TieredCache("pubmed_articles", PUBMED_ARTICLE_TTL, PUBMED_CACHE_MEMORY_ENTRIES,
+                                                PUBMED_CACHE_DISK_ENTRIES, PUBMED_CACHE_PATH)
+        # URL -> extracted main text and validators of enriched web search result pages
+        self.web_page_cache = TieredCache("web_pages", WEB_PAGE_CACHE_TTL, WEB_PAGE_MEMORY_ENTRIES,
+                                          WEB_PAGE_CACHE_ENTRIES, WEB_PAGE_CACHE_PATH)
+        # Separate pool for page fetches, which are started from inside a tool call on self.executor
+        self.page_executor = ThreadPoolExecutor(max_workers=WEB_PAGE_WORKERS, thread_name_prefix="web-page")
+        METRICS.add_collector(self._collect_cache_metrics)
+        # Rate limiting, circuit breaking and request coalescing for the external backends
+        self.governors = {"PubMed": OutboundGovernor("PubMed", NCBI_RATE_LIMIT),
+                          "WebSearch": OutboundGovernor("WebSearch", WEB_SEARCH_RATE_LIMIT)}
+        # The vector store and the embedding model are opened lazily on first use;
+        # see the collection and embedding_function properties
+        self.vector_store_lock = threading.Lock()
+        self.vector_store_error = None
+        self._client = None
+        self._collection = None
+        self._embedding_function = embedding_function
+        self.embedding_function_error = None
+        self.embedding_function_lock = threading.Lock()
+        # The BM25 index is loaded with the vector store unless RETRIEVAL_MODE is "dense", in which
+        # case it is only loaded once something needs it; see _ensure_lexical_index
+        self.lexical_index = BM25Index()
+        self.lexical_index_path = os.path.join(VECTOR_STORE_PATH, LEXICAL_INDEX_FILE) if VECTOR_STORE_PATH else None
+        self.lexical_index_lock = threading.RLock()
+        self.lexical_index_loaded = False
+        # (inode, mtime) of the index file this process last loaded or saved, when it was last
+        # checked, and the changes made since the last save; see _load_saved_lexical_index
+        self.lexical_index_stamp = None
+        self.lexical_index_checked_at = 0.0
+        self.lexical_changes: List[tuple] = []
+        # Vector store version this process last read from or wrote to the catalogue; see _reload_if_stale
+        self.known_version = 0
+        self.version_checked_at = 0.0
+        # Per-document catalogue (name, hash, chunk count, size, ingest time) kept next to the vector store
         try:
-            self.client = chromadb.Client()
-            self.collection = self.client.get_or_create_collection("my_collection")
-            # Add some sample data
-            self.collection.add(
-                documents=[
-                    "Alzheimer's disease is a progressive neurodegenerative disorder.",
-                    "New treatments for Alzheimer's are being developed.",
-                    "Early diagnosis is crucial for managing Alzheimer's disease."
-                ],
-                ids=["doc1", "doc2", "doc3"]
-            )
-            logging.info("ToolOrchestrator initialized successfully with ChromaDB connection and sample data.")
-        except Exception as e:
-            logging.error(f"Error initializing ToolOrchestrator: {e}")
-            # Depending on the desired behavior, you might want to raise the exception
-            # or handle it in a way that allows the application to continue (if possible)
-            # For now, we log the error and the object might be in a partially initialized state.
-            self.client = None
-            self.collection = None
-
-    def execute_tools(self, tools: list, query: str) -> str:
-        # Execute the selected tools and aggregate the results
-        results = []
-        logging.info(f"Executing tools: {tools} for query: '{query}'")
-        for tool in tools:
+            self.catalog = DocumentCatalog(os.path.join(VECTOR_STORE_PATH, DOCUMENT_CATALOG_FILE) if VECTOR_STORE_PATH else None)
+        except sqlite3.Error as e:
+            logging.error(f"Error opening document catalogue, keeping it in memory: {e}")
+            self.catalog = DocumentCatalog()
+        # Tool name -> query function, filled in from TOOL_FACTORIES as tools are first used.
+        # Each tool is constructed under its own lock so a slow one does not hold up the others.
+        self.tools: Dict[str, Callable[[str], dict]] = {}
+        self.tool_locks: Dict[str, threading.Lock] = {}
+        self.tool_lock = threading.Lock()
+        # Source name -> lock held while a document of that name is ingested
+        self.ingest_locks: Dict[str, threading.Lock] = {}
+        self.ingest_locks_lock = threading.Lock()
+        self.startup_timings: Dict[str, float] = {}
+        self.startup_timings["orchestrator_init"] = time.monotonic() - start
+        METRICS.set_gauge("chatbot_startup_seconds", self.startup_timings["orchestrator_init"], phase="init", component="orchestrator")
+        logging.info(f"ToolOrchestrator initialized in {self.startup_timings['orchestrator_init']:.3f}s.")
+        if TOOL_WARMUP:
+            self.warm_up(TOOL_WARMUP)
+
+    @property
+    def embedding_function(self):
+        # Build the default Chroma embedding function (and import chromadb) on first use
+        if self._embedding_function is None and self.embedding_function_error is None:
+            with self.embedding_function_lock:
+                if self._embedding_function is None and self.embedding_function_error is None:
+                    try:
+                        embedding_functions = lazy_import("chromadb.utils.embedding_functions")
+                        self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+                    except Exception as e:
+                        logging.error(f"Error initializing embedding function: {e}")
+                        self.embedding_function_error = e
+        return self._embedding_function
+
+    def get_tool(self, name: str) -> Callable[[str], dict]:
+        """
+        Returns the query function of a registered tool, constructing it with its factory
+        on first use. Raises KeyError for unknown tools; a factory that fails is retried
+        on the next call.
+        """
+        tool = self.tools.get(name)
+        if tool is not None:
+            return tool
+        factory = TOOL_FACTORIES[name]
+        with self.tool_lock:
+            lock = self.tool_locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self.tools:
+                with METRICS.timed("tool_init", self.startup_timings, tool=name):
+                    self.tools[name] = factory(self)
+                METRICS.set_gauge("chatbot_startup_seconds", self.startup_timings[f"tool_init:{name}"], phase="init", component=name)
+                logging.info(f"Tool {name} ready in {self.startup_timings[f'tool_init:{name}']:.2f}s.")
+            return self.tools[name]
+
+    def warm_up(self, tools: Optional[List[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Constructs the given tools (all registered tools for None or ["all"]) and loads the
+        embedding model ahead of the first request. Runs in a daemon thread unless
+        `background` is False; returns the thread.
+        """
+        names = list(TOOL_FACTORIES) if not tools or tools == ["all"] else tools
+
+        def run():
+            for name in names:
+                try:
+                    self.get_tool(name)
+                except KeyError:
+                    logging.warning(f"Cannot warm up unknown tool: {name}")
+                except Exception as e:
+                    logging.error(f"Error warming up tool {name}: {e}")
+            if self.embedding_function is not None:
+                try:
+                    self.embed_texts(["warm-up"])
+                except Exception as e:
+                    logging.error(f"Error warming up embedding function: {e}")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="tool-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def client(self):
+        if self._client is None and self.vector_store_error is None:
+            self._open_vector_store()
+        return self._client
+
+    @property
+    def collection(self):
+        # Open the vector store the first time it is needed
+        if self._collection is None and self.vector_store_error is None:
+            self._open_vector_store()
+        return self._collection
+
+    @property
+    def vector_store_version(self) -> int:
+        # Shared by all processes using the store, so caches built on vector store results
+        # (e.g. the semantic cache) are invalidated by changes made in any of them
+        return self.catalog.get_version()
+
+    def _bump_vector_store_version(self) -> None:
+        version = self.catalog.bump_version()
+        if version == self.known_version + 1:
+            # Nobody else wrote since we last looked, so our view of the store is current
+            self.known_version = version
+
+    def _reload_if_stale(self) -> None:
+        """
+        Reopens the persisted collection when another process has changed the store since
+        this one opened it: Chroma serves queries from an in-process copy of the index that
+        does not see other processes' writes.
+        """
+        now = time.monotonic()
+        if not VECTOR_STORE_PATH or self._collection is None or now - self.version_checked_at < VECTOR_STORE_RELOAD_INTERVAL:
+            return
+        self.version_checked_at = now
+        version = self.catalog.get_version()
+        if version == self.known_version:
+            return
+        with self.vector_store_lock:
+            if version == self.known_version:
+                return  # another thread reloaded it meanwhile
+            try:
+                chromadb = lazy_import("chromadb")
+                # A new client for the same path would share the cached system (and its stale index)
+                # unless it is dropped first; queries already running keep the old one
+                from chromadb.api.shared_system_client import SharedSystemClient
+                SharedSystemClient._identifier_to_system.pop(getattr(self._client, "_identifier", VECTOR_STORE_PATH), None)
+                client = chromadb.PersistentClient(path=VECTOR_STORE_PATH)
+                collection = client.get_collection(VECTOR_STORE_COLLECTION, embedding_function=self.embedding_function)
+                self._client, self._collection = client, collection
+                self.known_version = version
+                logging.info(f"Reopened vector store at version {version} after changes by another process.")
+            except Exception as e:
+                logging.error(f"Error reopening vector store, serving the previous view: {e}")
+
+    def _open_vector_store(self) -> None:
+        """
+        Opens the vector store collection. With VECTOR_STORE_PATH set the collection is
+        persisted on disk and reopened as-is on restart, so startup cost does not grow
+        with the corpus; sample data is only upserted into an empty, writable store.
+        """
+        with self.vector_store_lock:
+            if self._collection is not None:
+                return
+            start = time.monotonic()
             try:
-                if tool == "VectorStore":
-                    tool_result_dict = self.query_vector_store(query)
-                    # Extract content string before appending
-                    results.append(tool_result_dict.get("contents", ["Vector Store Error"])[0])
-                    logging.info(f"Successfully executed tool: {tool}")
-                elif tool == "PubMed":
-                    tool_result_dict = self.query_pubmed(query)
-                    # Extract content string before appending
-                    results.append(tool_result_dict.get("contents", ["PubMed Error"])[0])
-                    logging.info(f"Successfully executed tool: {tool}")
-                elif tool == "WebSearch":
-                    tool_result_dict = self.perform_web_search(query)
-                    # Extract content string before appending
-                    results.append(tool_result_dict.get("contents", ["Web Search Error"])[0])
-                    logging.info(f"Successfully executed tool: {tool}")
+                chromadb = lazy_import("chromadb")
+                if VECTOR_STORE_PATH:
+                    client = chromadb.PersistentClient(path=VECTOR_STORE_PATH)
                 else:
-                    logging.warning(f"Unknown tool requested: {tool}")
-                    results.append(f"Unknown tool: {tool}")
+                    client = chromadb.Client()
+                collection = client.get_or_create_collection(VECTOR_STORE_COLLECTION, embedding_function=self.embedding_function)
+                if not VECTOR_STORE_READ_ONLY and collection.count() == 0:
+                    # Seed an empty store with some sample data
+                    collection.upsert(documents=SAMPLE_DOCUMENTS, ids=[f"doc{i + 1}" for i in range(len(SAMPLE_DOCUMENTS))],
+                                      metadatas=[{"source": "sample"} for _ in SAMPLE_DOCUMENTS])
+                if RETRIEVAL_MODE != "dense":
+                    self._open_lexical_index(collection)
+                self._backfill_catalog(collection)
+                self.known_version = self.catalog.get_version()
+                self.version_checked_at = time.monotonic()
+                self._client, self._collection = client, collection
+                logging.info(f"Opened vector store collection '{VECTOR_STORE_COLLECTION}' at {VECTOR_STORE_PATH or 'memory'} "
+                             f"(read_only={VECTOR_STORE_READ_ONLY}) in {time.monotonic() - start:.2f}s.")
             except Exception as e:
-                logging.error(f"Error executing tool {tool}: {e}")
-                results.append(f"Error executing {tool}: {e}")
+                logging.error(f"Error opening vector store: {e}")
+                # Remember the failure so every request does not retry a broken store
+                self.vector_store_error = e
+
+    def _open_lexical_index(self, collection) -> None:
+        # Load the BM25 index saved next to the vector store, rebuilding it if it is missing
+        with self.lexical_index_lock:
+            if self.lexical_index_path:
+                self._load_saved_lexical_index()
+            if len(self.lexical_index) == 0 and collection.count() > 0:
+                start = time.monotonic()
+                offset = 0
+                while True:
+                    page = collection.get(limit=1000, offset=offset, include=["documents", "metadatas"])
+                    if not page["ids"]:
+                        break
+                    for doc_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                        self.lexical_index.add(doc_id, document or "", (metadata or {}).get("source", doc_id))
+                    offset += len(page["ids"])
+                logging.info(f"Rebuilt BM25 index over {len(self.lexical_index)} chunks in {time.monotonic() - start:.2f}s.")
+                if not VECTOR_STORE_READ_ONLY:
+                    self.save_lexical_index()
+            self.lexical_index_loaded = True
+
+    def _ensure_lexical_index(self) -> None:
+        # Load the BM25 index on first use when it was not loaded with the vector store
+        if self.lexical_index_loaded:
+            return
+        collection = self.collection
+        with self.lexical_index_lock:
+            if not self.lexical_index_loaded and collection is not None:
+                self._open_lexical_index(collection)
+
+    def _backfill_catalog(self, collection) -> None:
+        # Catalogue documents indexed before the catalogue existed, from their chunk metadata
+        if self.catalog.get_stats()["document_count"] > 0 or collection.count() == 0 or VECTOR_STORE_READ_ONLY:
+            return
+        start = time.monotonic()
+        documents = {}
+        offset = 0
+        while True:
+            page = collection.get(limit=1000, offset=offset, include=["metadatas"])
+            if not page["ids"]:
+                break
+            for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                source = (metadata or {}).get("source", doc_id)
+                document = documents.setdefault(source, {"doc_id": source_key(source), "name": source, "chunk_count": 0,
+                                                         "content_hash": (metadata or {}).get("content_hash")})
+                document["chunk_count"] += 1
+            offset += len(page["ids"])
+        self.catalog.upsert_many(documents.values())
+        logging.info(f"Catalogued {len(documents)} existing documents in {time.monotonic() - start:.2f}s.")
+
+    def save_lexical_index(self) -> None:
+        """
+        Persists the BM25 index next to the vector store. Every writer process keeps its own
+        copy of the index and saves the whole file, so under an exclusive lock on the file
+        the latest saved copy is reloaded first if another process replaced it, and this
+        process's unsaved changes are applied on top of it before it is written back.
+        """
+        if not self.lexical_index_path:
+            return
+        with self.lexical_index_lock, self._lexical_index_file_lock():
+            self._load_saved_lexical_index()
+            self.lexical_index.save(self.lexical_index_path)
+            self.lexical_index_stamp = self._lexical_index_file_stamp()
+            self.lexical_changes = []
+
+    def _change_lexical_index(self, method: str, *args) -> None:
+        # Apply a change to the in-memory BM25 index and remember it until the next save
+        self._ensure_lexical_index()
+        with self.lexical_index_lock:
+            getattr(self.lexical_index, method)(*args)
+            if self.lexical_index_path:
+                self.lexical_changes.append((method, args))
+
+    def _lexical_index_file_stamp(self):
+        # Every save replaces the file, so a new inode or mtime means another process saved it
+        try:
+            stat = os.stat(self.lexical_index_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load_saved_lexical_index(self) -> None:
+        # Load the index file if another process saved it since this one last read or wrote it,
+        # replaying this process's unsaved changes onto it (lexical_index_lock held)
+        stamp = self._lexical_index_file_stamp()
+        if stamp is None or stamp == self.lexical_index_stamp:
+            return
+        loaded = BM25Index.load(self.lexical_index_path)
+        if loaded is None:
+            return
+        for method, args in self.lexical_changes:
+            getattr(loaded, method)(*args)
+        self.lexical_index, self.lexical_index_stamp = loaded, stamp
+
+    def _refresh_lexical_index(self) -> None:
+        """
+        Picks up an index saved by another worker process (e.g. read-only workers after an
+        ingest) on the query path. Like _reload_if_stale this checks at most once every
+        VECTOR_STORE_RELOAD_INTERVAL seconds, and it is skipped while another thread is
+        loading or saving the index, so only one request pays for a reload.
+        """
+        self._ensure_lexical_index()
+        now = time.monotonic()
+        if not self.lexical_index_path or now - self.lexical_index_checked_at < VECTOR_STORE_RELOAD_INTERVAL:
+            return
+        if not self.lexical_index_lock.acquire(blocking=False):
+            return
+        try:
+            self.lexical_index_checked_at = now
+            self._load_saved_lexical_index()
+        finally:
+            self.lexical_index_lock.release()
 
+    @contextmanager
+    def _lexical_index_file_lock(self) -> Iterator[None]:
+        # Exclusive lock on a file next to the BM25 index, held while it is reloaded and saved
+        with open(self.lexical_index_path + ".lock", "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def add_documents(self, documents: List[str], ids: List[str], metadatas: Optional[List[dict]] = None, embeddings: Optional[List[List[float]]] = None) -> None:
+        """
+        Idempotently upserts chunks into the vector store and the lexical index and records
+        the documents they belong to (by their "source" metadata) in the catalogue with their
+        current chunk count. A chunk without a source gets its own ID as its source, so it
+        is catalogued, and can be deleted, as a one-chunk document.
+        """
+        metadatas = [{"source": doc_id, **(metadata or {})} for doc_id, metadata in zip(ids, metadatas or [{} for _ in ids])]
+        self._add_chunks(documents, ids, metadatas, embeddings)
+        self.save_lexical_index()
+        sources = {}
+        for metadata in metadatas:
+            sources.setdefault(metadata["source"], metadata)
+        catalogued = []
+        for source, metadata in sources.items():
+            existing = self.catalog.get(source_key(source)) or {}
+            catalogued.append({"doc_id": source_key(source), "name": source, "chunk_count": len(self._source_chunk_ids(source)),
+                               "size_bytes": existing.get("size_bytes", 0),
+                               "content_hash": metadata.get("content_hash") or existing.get("content_hash")})
+        self.catalog.upsert_many(catalogued)
+
+    def _add_chunks(self, documents: List[str], ids: List[str], metadatas: Optional[List[dict]] = None, embeddings: Optional[List[List[float]]] = None) -> None:
+        # Idempotently upsert chunks into the vector store and the lexical index; the caller
+        # catalogues them and saves the lexical index
+        if VECTOR_STORE_READ_ONLY:
+            raise RuntimeError("Vector store is opened read-only.")
+        if not self.collection:
+            raise RuntimeError("Vector store collection is not initialized.")
+        self.collection.upsert(documents=documents, ids=ids, metadatas=metadatas, embeddings=embeddings)
+        for doc_id, document, metadata in zip(ids, documents, metadatas or [{} for _ in ids]):
+            self._change_lexical_index("add", doc_id, document, (metadata or {}).get("source", doc_id))
+        self._bump_vector_store_version()
+
+    def _source_chunk_ids(self, source: str) -> List[str]:
+        # IDs of every chunk currently stored for a source
+        return self.collection.get(where={"source": source}, include=[])["ids"]
+
+    def _delete_chunks(self, ids: List[str]) -> None:
+        # Remove chunks by ID from the vector store and the lexical index (saved by the caller)
+        if not ids:
+            return
+        for offset in range(0, len(ids), 1000):
+            self.collection.delete(ids=ids[offset:offset + 1000])
+        for doc_id in ids:
+            self._change_lexical_index("delete", doc_id)
+        self._bump_vector_store_version()
+
+    def _delete_source(self, source: str) -> None:
+        # Remove every chunk of a source from the vector store, the lexical index (saved by the
+        # caller) and the catalogue
+        self.collection.delete(where={"source": source})
+        self._change_lexical_index("delete_source", source)
+        self.catalog.delete(source_key(source))
+
+    def _collect_cache_metrics(self, registry) -> None:
+        # Publish PubMed and web page cache counters to the metrics registry
+        for cache in (self.pubmed_query_cache, self.pubmed_article_cache, self.web_page_cache):
+            stats = cache.get_stats()
+            registry.set_counter("chatbot_cache_lookups_total", stats["memory_hits"] + stats["disk_hits"], cache=cache.name, result="hit")
+            registry.set_counter("chatbot_cache_lookups_total", stats["misses"], cache=cache.name, result="miss")
+            registry.set_gauge("chatbot_cache_hit_ratio", stats["hit_rate"], cache=cache.name)
+            registry.set_gauge("chatbot_cache_entries", stats["memory_size"], cache=cache.name, tier="memory")
+            if "disk_size" in stats:
+                registry.set_gauge("chatbot_cache_entries", stats["disk_size"], cache=cache.name, tier="disk")
+
+    def execute_tools(self, tools: list, query: str, concurrent: Optional[bool] = None) -> str:
+        # Execute the selected tools and aggregate the results
+        if concurrent is None:
+            concurrent = CONCURRENT_TOOLS
+        logging.info(f"Executing tools: {tools} for query: '{query}' (concurrent={concurrent})")
+        tool_results = self.run_tools(tools, query, concurrent=concurrent)
+        results = [tool_results[tool]["contents"][0] for tool in tools if tool in tool_results]
         logging.info("Finished executing all requested tools.")
         return "\n".join(results)
 
+    def run_tools(self, tools: list, query: str, concurrent: bool = True, timeouts: Optional[Dict[str, float]] = None) -> Dict[str, dict]:
+        """
+        Runs the selected tools and returns a dict of tool name -> result dict.
+        Each result dict holds "contents", "sources", "passages" (one {"text", "source"} dict
+        per retrieved item), "status" ("ok", "empty" for no results, "error" or "timeout") and
+        "elapsed" (seconds).
+        """
+        if not concurrent:
+            return {tool: self._run_tool(tool, query) for tool in tools}
+        return {result["tool"]: result for result in self.iter_tool_results(tools, query, timeouts)}
+
+    def iter_tool_results(self, tools: list, query: str, timeouts: Optional[Dict[str, float]] = None) -> Iterator[dict]:
+        """
+        Fans out all selected tools on the shared worker pool and yields each tool's
+        result dict as soon as it completes. Each tool's deadline counts from when it
+        starts running, so time spent queued for a pool thread (up to TOOL_QUEUE_TIMEOUT)
+        does not use up its timeout. A tool that misses
+        its deadline is yielded as a "timeout" result and abandoned, so the total wait is
+        bounded by the slowest tool that finishes in time rather than the sum of all tool
+        latencies.
+        """
+        timeouts = {**TOOL_TIMEOUTS, **(timeouts or {})}
+        submitted_at = time.monotonic()
+        started_at: Dict[str, float] = {}
+
+        def run(tool: str) -> dict:
+            started_at[tool] = time.monotonic()
+            return self._run_tool(tool, query)
+
+        def deadline(tool: str) -> float:
+            if tool not in started_at:
+                return submitted_at + TOOL_QUEUE_TIMEOUT
+            return started_at[tool] + timeouts.get(tool, DEFAULT_TOOL_TIMEOUT)
+
+        def wake_up(tool: str, now: float) -> float:
+            # A queued tool can start at any moment and nothing signals it, so wake up no later
+            # than the earliest deadline it could get if it started right now and check again
+            if tool not in started_at:
+                return min(deadline(tool), now + timeouts.get(tool, DEFAULT_TOOL_TIMEOUT))
+            return deadline(tool)
+
+        pending = {self.executor.submit(run, tool): tool for tool in dict.fromkeys(tools)}
+        try:
+            while pending:
+                now = time.monotonic()
+                next_wake_up = min(wake_up(tool, now) for tool in pending.values())
+                done, _ = wait(pending, timeout=max(0.0, next_wake_up - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.pop(future)
+                    yield future.result()
+                now = time.monotonic()
+                for future, tool in list(pending.items()):
+                    if future not in done and now >= deadline(tool):
+                        pending.pop(future)
+                        future.cancel()
+                        timeout = timeouts.get(tool, DEFAULT_TOOL_TIMEOUT) if tool in started_at else TOOL_QUEUE_TIMEOUT
+                        logging.warning(f"Tool {tool} missed its {timeout:.1f}s deadline "
+                                        f"({'running' if tool in started_at else 'still queued'}); returning partial results.")
+                        METRICS.inc("chatbot_tool_timeouts_total", tool=tool)
+                        yield {"tool": tool, "contents": [f"{tool} Timeout: no result within {timeout:.1f}s"],
+                               "sources": [], "passages": [], "status": "timeout", "elapsed": now - submitted_at}
+        finally:
+            # The caller stopped early (e.g. the evaluator found the context sufficient):
+            # abandon the tools still running and record how much waiting that saved
+            for future, tool in pending.items():
+                if not future.done():
+                    self._abandon(future, tool)
+
+    def _abandon(self, future, tool: str) -> None:
+        # Cancel a queued tool call, or let a running one finish in the background unobserved
+        abandoned_at = time.monotonic()
+        METRICS.inc("chatbot_tool_abandoned_total", tool=tool)
+        if future.cancel():
+            return
+        future.add_done_callback(lambda _: METRICS.observe("chatbot_early_exit_saved_seconds", time.monotonic() - abandoned_at, tool=tool))
+
+    def _run_tool(self, tool: str, query: str) -> dict:
+        # Run a single tool and normalize its result dict. Tools that catch their own
+        # backend errors report them with "status": "error" in the result dict, and
+        # searches that found nothing with "status": "empty".
+        start = time.monotonic()
+        METRICS.add_gauge("chatbot_stage_in_flight", 1, stage="tool_call", tool=tool)
+        try:
+            if tool in TOOL_FACTORIES:
+                tool_result_dict = self.get_tool(tool)(query)
+            else:
+                logging.warning(f"Unknown tool requested: {tool}")
+                tool_result_dict = {"contents": [f"Unknown tool: {tool}"], "sources": [], "status": "error"}
+            status = tool_result_dict.get("status", "ok")
+            if status == "ok":
+                logging.info(f"Successfully executed tool: {tool}")
+            else:
+                logging.warning(f"Tool {tool} returned status {status}: {(tool_result_dict.get('contents') or [''])[0][:200]}")
+        except Exception as e:
+            logging.error(f"Error executing tool {tool}: {e}")
+            tool_result_dict = {"contents": [f"Error executing {tool}: {e}"], "sources": []}
+            status = "error"
+        elapsed = time.monotonic() - start
+        METRICS.add_gauge("chatbot_stage_in_flight", -1, stage="tool_call", tool=tool)
+        METRICS.observe("chatbot_stage_duration_seconds", elapsed, stage="tool_call", tool=tool)
+        METRICS.inc("chatbot_tool_results_total", tool=tool, status=status)
+        if status == "error":
+            METRICS.inc("chatbot_stage_errors_total", stage="tool_call", tool=tool)
+        contents = tool_result_dict.get("contents") or [f"{tool} Error"]
+        return {"tool": tool, "contents": contents, "sources": tool_result_dict.get("sources", []),
+                "passages": tool_result_dict.get("passages", []), "status": status, "elapsed": elapsed}
+
+    def ingest_document(self, file_path: str, source: Optional[str] = None, content_hash: Optional[str] = None,
+                        progress: Optional[Callable[[dict], None]] = None, should_cancel: Optional[Callable[[], bool]] = None) -> dict:
+        """
+        Streams a PDF or text file into the vector store: pages are read one at a time,
+        split into chunks, embedded in fixed-size batches and upserted in bulk with
+        source and page metadata, so memory use does not depend on document size.
+        `progress` is called with the running stats after every batch; if `should_cancel`
+        returns True the ingestion stops and the partially indexed chunks are removed. An
+        earlier upload of the same source is replaced only once the new one is complete;
+        uploads of the same source run one at a time.
+        Returns ingestion stats including throughput in chunks per second.
+        """
+        source = source or os.path.basename(file_path)
+        if VECTOR_STORE_READ_ONLY:
+            raise RuntimeError("Vector store is opened read-only.")
+        if not self.collection:
+            raise RuntimeError("Vector store collection is not initialized.")
+        with self.ingest_locks_lock:
+            lock = self.ingest_locks.setdefault(source, threading.Lock())
+        with lock:
+            return self._ingest_document(file_path, source, content_hash, progress, should_cancel)
+
+    def _ingest_document(self, file_path: str, source: str, content_hash: Optional[str],
+                         progress: Optional[Callable[[dict], None]], should_cancel: Optional[Callable[[], bool]]) -> dict:
+        # Stream one upload into the vector store (the source's ingest lock held)
+        start = time.monotonic()
+        stats = {"source": source, "pages": 0, "chunks": 0, "batches": 0, "cancelled": False}
+
+        def counted_pages():
+            for page, text in iter_pages(file_path):
+                stats["pages"] += 1
+                yield page, text
+
+        # The new version is written under a fresh generation next to any earlier upload of
+        # the same source, which is only removed once the new version is complete. A failed or
+        # cancelled re-upload removes its own partial chunks and leaves the old version intact.
+        doc_id = source_key(source)
+        generation = uuid.uuid4().hex[:8]
+        written_ids = []
+        extra_metadata = {"content_hash": content_hash} if content_hash else {}
+        timings = {}
+        batches = iter_batches(iter_chunks(counted_pages()), EMBED_BATCH_SIZE)
+        try:
+            while True:
+                # Pages are parsed and chunked lazily while the next batch is pulled
+                with METRICS.timed("ingest_parse", timings):
+                    batch = next(batches, None)
+                if batch is None:
+                    break
+                if should_cancel and should_cancel():
+                    stats["cancelled"] = True
+                    break
+                texts = [chunk["text"] for chunk in batch]
+                ids = [f"{doc_id}-{generation}-{chunk['chunk_index']}" for chunk in batch]
+                metadatas = [{"source": source, "chunk_index": chunk["chunk_index"], "generation": generation, **extra_metadata,
+                              **({"page": chunk["page"]} if chunk["page"] else {})} for chunk in batch]
+                with METRICS.timed("ingest_embed", timings):
+                    embeddings = self.embed_texts(texts)
+                with METRICS.timed("ingest_upsert", timings):
+                    written_ids += ids
+                    self._add_chunks(texts, ids, metadatas, embeddings)
+                stats["chunks"] += len(batch)
+                stats["batches"] += 1
+                if progress:
+                    progress(dict(stats))
+        except BaseException:
+            logging.error(f"Ingestion of {source} failed; removing its {len(written_ids)} partially indexed chunks.")
+            try:
+                self._delete_chunks(written_ids)
+                self.save_lexical_index()
+            except Exception as e:
+                logging.error(f"Error removing partial chunks of {source}: {e}")
+            raise
+
+        if stats["cancelled"]:
+            self._delete_chunks(written_ids)
+        else:
+            # Everything of the source that is not part of this generation is an earlier version
+            current_ids = set(written_ids)
+            self._delete_chunks([chunk_id for chunk_id in self._source_chunk_ids(source) if chunk_id not in current_ids])
+            if stats["chunks"]:
+                stats["document"] = self.catalog.upsert(doc_id, source, stats["chunks"], os.path.getsize(file_path), content_hash)
+            else:
+                self.catalog.delete(doc_id)
+        # The lexical index is saved once per document rather than after every batch
+        self.save_lexical_index()
+        stats["timings"] = timings
+        stats["elapsed"] = time.monotonic() - start
+        stats["chunks_per_sec"] = stats["chunks"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        logging.info(f"{'Cancelled ingestion of' if stats['cancelled'] else 'Ingested'} {source}: {stats['pages']} pages, "
+                     f"{stats['chunks']} chunks in {stats['elapsed']:.2f}s ({stats['chunks_per_sec']:.1f} chunks/sec).")
+        return stats
+
+    def find_document_by_hash(self, content_hash: str) -> Optional[str]:
+        # Return the source name of an already indexed document with this content hash
+        document = self.catalog.find_by_hash(content_hash)
+        return document["name"] if document else None
+
+    def list_documents(self, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, **filters) -> dict:
+        """
+        Returns a page of catalogued documents, newest first, as {"documents", "next_cursor"}.
+        Filters are passed to DocumentCatalog.list (name, content_hash, since).
+        """
+        documents, next_cursor = self.catalog.list(limit, cursor, **filters)
+        return {"documents": documents, "next_cursor": next_cursor}
+
+    def get_vector_store_status(self) -> dict:
+        # Catalogue totals; cheap enough to poll, as nothing is counted on request
+        return {**self.catalog.get_stats(), "collection": VECTOR_STORE_COLLECTION, "read_only": VECTOR_STORE_READ_ONLY}
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        # Embed texts with the same model the vector store collection uses
+        if not self.embedding_function:
+            raise RuntimeError("Embedding function is not initialized.")
+        return [list(map(float, embedding)) for embedding in self.embedding_function(list(texts))]
+
+    def delete_document(self, doc_id: str) -> bool:
+        """
+        Deletes a catalogued document with all its chunks, or a single chunk by chunk ID.
+        Returns False if there was nothing with that ID.
+        """
+        if VECTOR_STORE_READ_ONLY:
+            raise RuntimeError("Vector store is opened read-only.")
+        if not self.collection:
+            raise RuntimeError("Vector store collection is not initialized.")
+        document = self.catalog.get(doc_id)
+        if document:
+            self._delete_source(document["name"])
+        else:
+            chunk = self.collection.get(ids=[doc_id], include=["metadatas"])
+            if not chunk["ids"]:
+                return False
+            self.collection.delete(ids=[doc_id])
+            self._change_lexical_index("delete", doc_id)
+            self.catalog.remove_chunks(source_key((chunk["metadatas"][0] or {}).get("source", doc_id)))
+        self.save_lexical_index()
+        self._bump_vector_store_version()
+        logging.info(f"Deleted {'document ' + document['name'] if document else 'chunk ' + doc_id} from the vector store.")
+        return True
+
     def query_vector_store(self, query: str) -> dict:
         # Query the vector store
-        logging.debug(f"Querying Vector Store with: '{query}'")
+        logging.debug(f"Querying Vector Store with: '{query}' (mode={RETRIEVAL_MODE})")
         if not self.collection:
             logging.error("Vector store collection is not initialized.")
-            return {"contents": ["Vector Store Error: Collection not initialized."], "sources": []}
+            return {"contents": ["Vector Store Error: Collection not initialized."], "sources": [], "status": "error"}
         try:
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=2
-            )
+            hits = self.retrieve(query, VECTOR_STORE_N_RESULTS)
+            if not hits:
+                return {"contents": ["Vector Store Results:\nNo results found."], "sources": [], "status": "empty"}
             logging.info(f"Vector Store query successful for: '{query}'")
-            return {"contents": [doc.page_content for doc in results["documents"][0]], "sources": [doc.metadata.get("source", "unknown") for doc in results["documents"][0]]}
+            return {"contents": ["Vector Store Results:\n" + "\n".join(hit["text"] for hit in hits)],
+                    "sources": [hit["source"] for hit in hits],
+                    "passages": [{"text": hit["text"], "source": hit["source"]} for hit in hits]}
         except Exception as e:
             logging.error(f"Error querying Vector Store: {e}")
-            return {"contents": [f"Vector Store Query Error: {e}"], "sources": []}
+            return {"contents": [f"Vector Store Query Error: {e}"], "sources": [], "status": "error"}
+
+    def retrieve(self, query: str, n_results: int, mode: Optional[str] = None) -> List[dict]:
+        """
+        Retrieves the top n_results chunks as dicts with "id", "text", "source" and "score".
+        "dense" ranks by embedding similarity in Chroma, "lexical" by BM25 without an
+        embedding call, and "hybrid" merges both rankings with reciprocal rank fusion.
+        """
+        mode = mode or RETRIEVAL_MODE
+        self._reload_if_stale()
+        if mode == "dense":
+            return self._dense_search(query, n_results)
+        self._refresh_lexical_index()
+        if mode == "lexical":
+            lexical = self.lexical_index.search(query, n_results)
+            texts = self._get_texts([doc_id for doc_id, _, _ in lexical])
+            return [{"id": doc_id, "text": texts[doc_id], "source": source, "score": score}
+                    for doc_id, score, source in lexical if doc_id in texts]
+
+        candidates = max(n_results, HYBRID_CANDIDATES)
+        dense = self._dense_search(query, candidates)
+        lexical = self.lexical_index.search(query, candidates)
+        fused = {}
+        for rank, hit in enumerate(dense):
+            fused[hit["id"]] = dict(hit, score=1.0 / (RRF_K + rank + 1))
+        for rank, (doc_id, _, source) in enumerate(lexical):
+            entry = fused.setdefault(doc_id, {"id": doc_id, "text": None, "source": source, "score": 0.0})
+            entry["score"] += 1.0 / (RRF_K + rank + 1)
+        hits = sorted(fused.values(), key=lambda hit: hit["score"], reverse=True)[:n_results]
+        # Lexical-only hits need their text fetched; this is a key lookup, not an embedding call
+        texts = self._get_texts([hit["id"] for hit in hits if hit["text"] is None])
+        return [dict(hit, text=hit["text"] if hit["text"] is not None else texts[hit["id"]])
+                for hit in hits if hit["text"] is not None or hit["id"] in texts]
+
+    def _dense_search(self, query: str, n_results: int) -> List[dict]:
+        results = self.collection.query(query_texts=[query], n_results=n_results, include=["documents", "metadatas", "distances"])
+        ids = results["ids"][0]
+        metadatas = (results.get("metadatas") or [[]])[0] or [{} for _ in ids]
+        distances = (results.get("distances") or [[]])[0] or [0.0 for _ in ids]
+        return [{"id": doc_id, "text": document, "source": (metadata or {}).get("source", doc_id), "score": -distance}
+                for doc_id, document, metadata, distance in zip(ids, results["documents"][0], metadatas, distances)]
+
+    def _get_texts(self, ids: List[str]) -> Dict[str, str]:
+        if not ids:
+            return {}
+        results = self.collection.get(ids=ids, include=["documents"])
+        return dict(zip(results["ids"], results["documents"]))
 
     def query_pubmed(self, query: str) -> dict:
         # Query PubMed
         logging.debug(f"Querying PubMed with: '{query}'")
         try:
-            handle = Entrez.esearch(db="pubmed", term=query, retmax=5, rettype="abstract", retmode="xml")
-            record = Entrez.read(handle)
-            handle.close()
-
-            results = []
-            id_list = record.get("IdList", [])
+            query_key = f"{PUBMED_RETMAX}:{' '.join(query.lower().split())}"
+            id_list = self.pubmed_query_cache.get(query_key)
+            if id_list is None:
+                id_list = self.search_pubmed_ids(query)
+                self.pubmed_query_cache.set(query_key, id_list)
             if not id_list:
                 logging.warning(f"No PubMed results found for query: '{query}'")
-                return {"contents": ["PubMed Results:\nNo results found."], "sources": []}
+                return {"contents": ["PubMed Results:\nNo results found."], "sources": [], "status": "empty"}
 
             logging.info(f"Found {len(id_list)} PubMed IDs for query: '{query}'")
+            # Only go to NCBI for articles that are not already cached
+            articles = self.pubmed_article_cache.get_many(id_list)
+            missing_ids = [pubmed_id for pubmed_id in id_list if pubmed_id not in articles]
+            if missing_ids:
+                fetched = self.fetch_pubmed_articles(missing_ids)
+                self.pubmed_article_cache.set_many({pubmed_id: article for pubmed_id, article in fetched.items() if "error" not in article})
+                articles.update(fetched)
+            logging.debug(f"PubMed article cache served {len(id_list) - len(missing_ids)} of {len(id_list)} articles.")
+            results = []
+            passages = []
             for pubmed_id in id_list:
-                try:
-                    fetch_handle = Entrez.efetch(db="pubmed", id=pubmed_id, rettype="abstract", retmode="xml")
-                    article = Entrez.read(fetch_handle)
-                    fetch_handle.close()
-                    # Safely access nested dictionary keys
-                    medline_citation = article.get("MedlineCitation", {})
-                    article_info = medline_citation.get("Article", {})
-                    title = article_info.get("ArticleTitle", "No Title Available")
-                    abstract_info = article_info.get("Abstract", {})
-                    abstract = abstract_info.get("AbstractText", ["No Abstract Available"])[0] # Get first abstract text if available
-                    results.append(f"Title: {title}\nAbstract: {abstract}\n")
-                    logging.debug(f"Fetched details for PubMed ID: {pubmed_id}")
-                except Exception as fetch_e:
-                    logging.error(f"Error fetching details for PubMed ID {pubmed_id}: {fetch_e}")
+                article = articles.get(pubmed_id, {"error": "not returned by efetch"})
+                if "error" in article:
+                    logging.error(f"Error fetching details for PubMed ID {pubmed_id}: {article['error']}")
                     results.append(f"Error fetching details for ID {pubmed_id}")
+                else:
+                    results.append(f"Title: {article['title']}\nAbstract: {article['abstract']}\n")
+                    passages.append({"text": results[-1], "source": pubmed_id})
 
+            if not passages:
+                # Every article failed (e.g. efetch was rejected), so the result is an error, not an answer
+                return {"contents": ["PubMed Results:\n" + "\n".join(results)], "sources": [], "status": "error"}
             logging.info(f"PubMed query successful for: '{query}'")
-            return {"contents": ["PubMed Results:\n" + "\n".join(results)], "sources": [pubmed_id for pubmed_id in id_list]}
+            return {"contents": ["PubMed Results:\n" + "\n".join(results)], "sources": list(id_list), "passages": passages}
         except Exception as e:
             logging.error(f"Error querying PubMed: {e}")
             # Return a more specific error message if possible
-            return {"contents": [f"PubMed Query Error: {type(e).__name__} - {e}"], "sources": []}
+            return {"contents": [f"PubMed Query Error: {type(e).__name__} - {e}"], "sources": [], "status": "error"}
+
+    def search_pubmed_ids(self, query: str) -> List[str]:
+        # Run esearch and return the matching PMIDs
+        record = self._call_eutils("esearch", db="pubmed", term=query, retmax=PUBMED_RETMAX)
+        return [str(pubmed_id) for pubmed_id in record.get("IdList", [])]
+
+    def fetch_pubmed_articles(self, id_list: List[str]) -> Dict[str, dict]:
+        """
+        Fetches all PMIDs in a single comma-joined efetch call and parses the
+        PubmedArticleSet in one pass. Returns a dict of PMID -> {"title", "abstract"},
+        or PMID -> {"error"} for articles that could not be fetched or parsed.
+        """
+        if not id_list:
+            return {}
+        try:
+            article_set = self._call_eutils("efetch", db="pubmed", id=",".join(id_list), rettype="abstract", retmode="xml")
+        except Exception as e:
+            logging.error(f"Error fetching PubMed IDs {id_list}: {e}")
+            return {pubmed_id: {"error": f"{type(e).__name__} - {e}"} for pubmed_id in id_list}
+
+        articles = {}
+        for index, pubmed_article in enumerate(article_set.get("PubmedArticle", [])):
+            try:
+                medline_citation = pubmed_article.get("MedlineCitation", {})
+                pubmed_id = str(medline_citation.get("PMID", ""))
+                article_info = medline_citation.get("Article", {})
+                title = str(article_info.get("ArticleTitle", "No Title Available"))
+                abstract_info = article_info.get("Abstract", {})
+                # Get first abstract text if available
+                abstract = str((abstract_info.get("AbstractText") or ["No Abstract Available"])[0])
+                articles[pubmed_id] = {"title": title, "abstract": abstract}
+                logging.debug(f"Fetched details for PubMed ID: {pubmed_id}")
+            except Exception as parse_e:
+                # Attribute the failure to the PMID at the same position in the request
+                pubmed_id = id_list[index] if index < len(id_list) else f"article {index}"
+                articles[pubmed_id] = {"error": f"{type(parse_e).__name__} - {parse_e}"}
+        return articles
+
+    def _call_eutils(self, utility: str, **params):
+        # Call an E-utility over the shared keep-alive session and parse the XML with Entrez.read.
+        # Calls go through the NCBI governor: identical concurrent calls share one request,
+        # and all worker processes stay under NCBI's per-host rate limit together.
+        params.update(email=ENTREZ_EMAIL, tool="chatbot_v3")
+        if NCBI_API_KEY:
+            params["api_key"] = NCBI_API_KEY
+
+        def fetch():
+            response = get_session().get(f"{EUTILS_BASE_URL}{utility}.fcgi", params=params, timeout=HTTP_TIMEOUT)
+            response.raise_for_status()
+            return _load_entrez().read(io.BytesIO(response.content))
+
+        return self.governors["PubMed"].call(f"{utility}?{json.dumps(params, sort_keys=True)}", fetch)
 
     def perform_web_search(self, query: str) -> dict:
         # Perform a web search using DuckDuckGo (Example - might be blocked)
@@ -132,28 +1114,85 @@ class ToolOrchestrator:
         try:
             # Using a simple GET request to DuckDuckGo HTML endpoint.
             # This is NOT a reliable method for production.
-            url = f"https://html.duckduckgo.com/html/?q={query}"
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-            response = requests.get(url, headers=headers, timeout=10) # Added timeout
-            response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-            # Basic parsing attempt - this is fragile
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(response.text, 'html.parser')
-            search_results = soup.find_all('div', class_='result__body')
-            snippets = [f"{res.find('a', class_='result__a').text}\n{res.find('a', class_='result__snippet').text}\n" for res in search_results[:3]] # Get top 3 results
-
-            if not snippets:
+            # The shared session reuses keep-alive connections and sends the browser User-Agent
+            def fetch():
+                response = get_session().get(WEB_SEARCH_URL, params={"q": query}, timeout=HTTP_TIMEOUT)
+                response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+                return response.text
+
+            # Identical concurrent searches share one request, and searches fail fast while DuckDuckGo is down
+            html = self.governors["WebSearch"].call(" ".join(query.lower().split()), fetch)
+            # Parsed with lxml when it is installed; links are resolved to the real result URLs
+            search_results = parse_search_results(html, WEB_SEARCH_URL, WEB_SEARCH_RESULTS)
+            if not search_results:
                  logging.warning(f"No web search results found or parsed for query: '{query}'")
-                 return {"contents": ["Web Search Results:\nNo results found."], "sources": []}
+                 return {"contents": ["Web Search Results:\nNo results found."], "sources": [], "status": "empty"}
 
-            logging.info(f"Web search successful for: '{query}'")
-            return {"contents": ["Web Search Results:\n" + "\n".join(snippets)], "sources": [result["url"] for result in [{"title": "Example Webpage", "snippet": "Example snippet", "url": "https://example.com"}]]}
+            page_texts = self.fetch_page_texts([result["url"] for result in search_results if result["url"]]) if WEB_ENRICH else {}
+            passages = []
+            for result in search_results:
+                # Fall back to the search snippet for pages that were not fetched in time
+                body = page_texts.get(result["url"]) or result["snippet"]
+                passages.append({"text": f"{result['title']}\n{body}\n", "source": result["url"] or WEB_SEARCH_URL})
+            logging.info(f"Web search successful for: '{query}' ({len(page_texts)} of {len(search_results)} pages enriched)")
+            return {"contents": ["Web Search Results:\n" + "\n".join(passage["text"] for passage in passages)],
+                    "sources": list(dict.fromkeys(passage["source"] for passage in passages)), "passages": passages}
         except requests.exceptions.RequestException as e:
             logging.error(f"Web Search Request Error: {e}")
-            return {"contents": [f"Web Search Error: {e}"], "sources": []}
+            return {"contents": [f"Web Search Error: {e}"], "sources": [], "status": "error"}
+        except (CircuitOpenError, RateLimitTimeout) as e:
+            logging.warning(f"Web search skipped: {e}")
+            return {"contents": [f"Web Search Unavailable: {e}"], "sources": [], "status": "error"}
         except Exception as e:
             logging.error(f"Error during web search processing: {e}")
-            return {"contents": [f"Web Search Processing Error: {e}"], "sources": []}
+            return {"contents": [f"Web Search Processing Error: {e}"], "sources": [], "status": "error"}
+
+    def fetch_page_texts(self, urls: List[str], budget: float = WEB_ENRICH_BUDGET) -> Dict[str, str]:
+        """
+        Fetches the main text of several pages concurrently and returns URL -> text for
+        those that finished within `budget` seconds, so the added latency is that of the
+        slowest page in budget. Pages still loading are left to finish (and fill the
+        cache) in the background.
+        """
+        futures = {self.page_executor.submit(self._fetch_page_text, url): url for url in dict.fromkeys(urls)}
+        done, not_done = wait(futures, timeout=budget)
+        for future in not_done:
+            METRICS.inc("chatbot_web_pages_total", result="over_budget")
+        texts = {}
+        for future in done:
+            text = future.result()
+            if text:
+                texts[futures[future]] = text
+        return texts
+
+    def _fetch_page_text(self, url: str) -> Optional[str]:
+        # Return a page's extracted text from the cache, revalidating or refetching stale entries
+        entry = self.web_page_cache.get(url)
+        if entry and time.time() - entry["fetched_at"] < WEB_PAGE_FRESH_TTL:
+            METRICS.inc("chatbot_web_pages_total", result="cached")
+            return entry["text"]
+        try:
+            with METRICS.timed("web_page_fetch"):
+                page = fetch_page(get_session(), url, WEB_PAGE_MAX_BYTES, WEB_PAGE_TIMEOUT,
+                                  etag=entry and entry.get("etag"), last_modified=entry and entry.get("last_modified"))
+            if page["status"] == "not_modified":
+                result = "revalidated"
+                entry = dict(entry, fetched_at=time.time())
+            else:
+                result = "fetched"
+                entry = {"text": extract_main_text(page["html"], WEB_PAGE_MAX_CHARS), "etag": page["etag"],
+                         "last_modified": page["last_modified"], "fetched_at": time.time()}
+            self.web_page_cache.set(url, entry)
+        except PageSkipped as e:
+            logging.debug(f"Skipped web page: {e}")
+            METRICS.inc("chatbot_web_pages_total", result=e.reason)
+            return None
+        except Exception as e:
+            logging.warning(f"Error fetching web page {url}: {e}")
+            METRICS.inc("chatbot_web_pages_total", result="error")
+            return None
+        METRICS.inc("chatbot_web_pages_total", result=result)
+        return entry["text"]
 
 if __name__ == "__main__":
     orchestrator = ToolOrchestrator()
@@ -0,0 +1,114 @@
+import re
+import time
+import logging
+import importlib.util
+from typing import List, Optional
+from urllib.parse import parse_qs, urljoin, urlparse
+
+import requests
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# lxml is several times faster than the pure-Python html.parser; it is used when installed
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+# Elements that never hold article text
+BOILERPLATE_TAGS = ["script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form", "iframe", "button"]
+TEXT_TAGS = ["p", "li", "h1", "h2", "h3", "blockquote", "pre"]
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+READ_CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r"\s+")
+
+class PageSkipped(Exception):
+    """Raised when a page is not fetched or not read in full (too large, too slow or not HTML)."""
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+def parse_html(html: str):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, HTML_PARSER)
+
+def result_url(href: str, base_url: str) -> Optional[str]:
+    # Resolve a search result link, unwrapping DuckDuckGo's /l/?uddg=<target> redirect links
+    if not href:
+        return None
+    url = urlparse(urljoin(base_url, href))
+    if url.path.startswith("/l/") and "uddg" in parse_qs(url.query):
+        url = urlparse(parse_qs(url.query)["uddg"][0])
+    return url.geturl() if url.scheme in ("http", "https") else None
+
+def parse_search_results(html: str, base_url: str, limit: int) -> List[dict]:
+    """Parses a DuckDuckGo HTML results page into up to `limit` {"title", "url", "snippet"} dicts."""
+    results = []
+    for body in parse_html(html).find_all("div", class_="result__body"):
+        link = body.find("a", class_="result__a")
+        if link is None:
+            continue
+        snippet = body.find(class_="result__snippet")
+        results.append({"title": link.get_text(" ", strip=True), "url": result_url(link.get("href", ""), base_url),
+                        "snippet": snippet.get_text(" ", strip=True) if snippet else ""})
+        if len(results) >= limit:
+            break
+    return results
+
+def fetch_page(session: requests.Session, url: str, max_bytes: int, timeout: float,
+               etag: Optional[str] = None, last_modified: Optional[str] = None) -> dict:
+    """
+    GETs a page, reading at most `max_bytes` and giving up after `timeout` seconds in
+    total. Sends If-None-Match/If-Modified-Since when validators are given. Returns
+    {"status": "ok", "html", "etag", "last_modified"} or {"status": "not_modified"};
+    raises PageSkipped for pages that are not HTML, too large or too slow, and
+    requests exceptions for HTTP errors.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    deadline = time.monotonic() + timeout
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304:
+            return {"status": "not_modified"}
+        response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type and content_type not in HTML_CONTENT_TYPES:
+            raise PageSkipped("not_html", f"{url} is {content_type}, not HTML")
+        if int(response.headers.get("Content-Length") or 0) > max_bytes:
+            raise PageSkipped("too_large", f"{url} is larger than {max_bytes} bytes")
+        body = bytearray()
+        for chunk in response.iter_content(READ_CHUNK_SIZE):
+            body += chunk
+            if len(body) >= max_bytes:
+                # Keep the head of an oversized page; the article text is usually near the top
+                del body[max_bytes:]
+                break
+            if time.monotonic() > deadline:
+                raise PageSkipped("timeout", f"{url} did not finish within {timeout:g}s")
+        # requests falls back to ISO-8859-1 for text/* without a charset; most pages are UTF-8
+        encoding = response.encoding if "charset" in response.headers.get("Content-Type", "").lower() else "utf-8"
+        return {"status": "ok", "html": body.decode(encoding, errors="replace"),
+                "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+def extract_main_text(html: str, max_chars: int) -> str:
+    """
+    Extracts the main article text of a page: boilerplate elements are dropped, the
+    <article>/<main> element (or else the element holding the most paragraph text) is
+    chosen, and its paragraphs are joined and cut to `max_chars` characters.
+    """
+    soup = parse_html(html)
+    for element in soup(BOILERPLATE_TAGS):
+        element.decompose()
+    root = soup.find("article") or soup.find("main") or soup.find(attrs={"role": "main"})
+    if root is None:
+        # Score each paragraph's parent by the paragraph text it directly holds
+        scores = {}
+        for paragraph in soup.find_all("p"):
+            parent = paragraph.parent
+            scores[id(parent)] = (scores.get(id(parent), (0, parent))[0] + len(paragraph.get_text(strip=True)), parent)
+        root = max(scores.values(), key=lambda score: score[0])[1] if scores else (soup.body or soup)
+    # Elements nested in another text element (e.g. <p> inside <li>) are covered by their parent
+    blocks = [WHITESPACE.sub(" ", element.get_text(" ", strip=True)) for element in root.find_all(TEXT_TAGS)
+              if element.find_parent(TEXT_TAGS) is None]
+    text = "\n".join(block for block in blocks if block) or WHITESPACE.sub(" ", root.get_text(" ", strip=True))
+    return text[:max_chars]
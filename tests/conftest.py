@@ -0,0 +1,55 @@
+"""
+Shared test setup. The application imports itself as the `chatbot_v3` package (see
+app/wsgi.py), so the repository directory is registered under that name when it is
+checked out elsewhere. Settings are read from the environment at import time, so the
+defaults below keep every test offline, unthrottled and free of on-disk caches.
+"""
+import os
+import sys
+import types
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.update({
+    "ENTREZ_EMAIL": "tests@example.com",
+    "NCBI_RATE_LIMIT": "0",
+    "RATE_LIMIT_PATH": "",
+    "PUBMED_CACHE_PATH": "",
+    "WEB_PAGE_CACHE_PATH": "",
+    "CONVERSATION_STORE_PATH": "",
+    "SEMANTIC_CACHE_ENABLED": "false",
+    "VECTOR_STORE_PATH": os.path.join(tempfile.mkdtemp(prefix="chatbot-tests-"), "vector_store"),
+})
+os.environ.pop("NCBI_API_KEY", None)
+
+if "chatbot_v3" not in sys.modules:
+    try:
+        import chatbot_v3  # noqa: F401
+    except ImportError:
+        package = types.ModuleType("chatbot_v3")
+        package.__path__ = [ROOT]
+        sys.modules["chatbot_v3"] = package
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_services import FakeServices, HashingEmbeddingFunction  # noqa: E402
+from chatbot_v3.src import tool_orchestrator  # noqa: E402
+from chatbot_v3.src.metrics import METRICS  # noqa: E402
+
+def counter_value(name: str, **labels) -> float:
+    # Current value of a counter series in the process-wide metrics registry
+    return METRICS.counters.get(name, {}).get(METRICS._key(labels), 0)
+
+@pytest.fixture
+def fake_services():
+    with FakeServices() as services:
+        yield services
+
+@pytest.fixture
+def orchestrator(fake_services, monkeypatch):
+    # An orchestrator whose NCBI and DuckDuckGo calls go to the local stand-ins
+    monkeypatch.setattr(tool_orchestrator, "EUTILS_BASE_URL", fake_services.eutils_base_url)
+    monkeypatch.setattr(tool_orchestrator, "WEB_SEARCH_URL", fake_services.web_search_url)
+    return tool_orchestrator.ToolOrchestrator(embedding_function=HashingEmbeddingFunction())
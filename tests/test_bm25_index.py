@@ -0,0 +1,74 @@
+from chatbot_v3.src.bm25_index import BM25Index, tokenize
+
+DOCUMENTS = {
+    "a": "Amyloid beta plaques accumulate in Alzheimer's disease.",
+    "b": "Tau protein tangles spread through the hippocampus.",
+    "c": "Microglia clear amyloid beta and drive neuroinflammation.",
+    "d": "Sleep disruption is a risk factor for cognitive decline.",
+}
+
+def build() -> BM25Index:
+    index = BM25Index()
+    for doc_id, text in DOCUMENTS.items():
+        index.add(doc_id, text, source=f"{doc_id}.txt")
+    return index
+
+def test_tokenize_keeps_hyphenated_and_possessive_terms():
+    assert tokenize("The APP-PS1 model of Alzheimer's") == ["app-ps1", "model", "alzheimer's"]
+
+def test_search_ranks_matching_documents():
+    results = build().search("amyloid beta plaques", k=3)
+    assert [doc_id for doc_id, _, _ in results] == ["a", "c"]
+    assert results[0][1] > results[1][1] > 0
+    assert results[0][2] == "a.txt"
+
+def test_search_without_matches_is_empty():
+    assert build().search("zebrafish") == []
+
+def test_re_adding_a_document_replaces_it():
+    index = build()
+    index.add("b", "Amyloid beta amyloid beta amyloid beta", source="b.txt")
+    assert len(index) == 4
+    assert index.search("tau tangles") == []
+    assert index.search("amyloid", k=1)[0][0] == "b"
+
+def test_deletes_and_compaction_keep_results_consistent():
+    index = build()
+    assert index.delete("a") is True
+    assert index.delete("a") is False
+    assert [doc_id for doc_id, _, _ in index.search("amyloid beta")] == ["c"]
+    index.add("e", "Tau protein is elevated in cerebrospinal fluid.", source="shared.txt")
+    index.add("f", "Tau imaging with PET.", source="shared.txt")
+    assert index.delete_source("shared.txt") == 2
+    # Enough tombstones to trigger compaction; the survivors are still searchable
+    assert len(index.doc_ids) == len(index) == 3
+    assert [doc_id for doc_id, _, _ in index.search("tau protein")] == ["b"]
+
+def test_save_and_load_round_trip(tmp_path):
+    index = build()
+    index.delete("d")
+    path = str(tmp_path / "bm25.pkl")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert len(loaded) == 3
+    assert loaded.search("amyloid beta") == index.search("amyloid beta")
+
+def test_load_missing_or_corrupt_file_returns_none(tmp_path):
+    assert BM25Index.load(str(tmp_path / "missing.pkl")) is None
+    corrupt = tmp_path / "corrupt.pkl"
+    corrupt.write_bytes(b"not a pickle")
+    assert BM25Index.load(str(corrupt)) is None
+
+def test_repeated_searches_do_not_leak_scores_between_queries():
+    index = build()
+    first = index.search("amyloid beta")
+    index.search("tau protein tangles")
+    assert index.search("amyloid beta") == first
+    assert [doc_id for doc_id, _, _ in index.search("sleep")] == ["d"]
+
+def test_equal_scores_keep_index_order():
+    index = BM25Index()
+    for doc_id in ("x", "y", "z"):
+        index.add(doc_id, "identical text about gliosis", source="s")
+    index.add("w", "unrelated", source="s")
+    assert [doc_id for doc_id, _, _ in index.search("gliosis", k=2)] == ["x", "y"]
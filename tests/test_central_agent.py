@@ -0,0 +1,41 @@
+from conftest import counter_value
+from chatbot_v3.src import central_agent
+from chatbot_v3.src.metrics import METRICS
+from chatbot_v3.src.central_agent import CentralAgent, EvaluatorAgent
+
+VECTOR_HITS = "Vector Store Results:\nAmyloid beta plaques accumulate in Alzheimer's disease."
+PUBMED_HITS = "PubMed Results:\nTitle: Amyloid clearance\nAbstract: Microglia clear amyloid beta."
+WEB_EMPTY = "Web Search Results:\nNo results found."
+
+def test_evaluator_needs_vector_store_hits_and_one_other_source():
+    evaluator = EvaluatorAgent()
+    assert evaluator.evaluate_context("\n".join([VECTOR_HITS, PUBMED_HITS]))
+    assert not evaluator.evaluate_context(VECTOR_HITS)
+    assert not evaluator.evaluate_context("\n".join([PUBMED_HITS, "Web Search Results:\nA page about tau."]))
+
+def test_evaluator_ignores_sections_without_results():
+    evaluator = EvaluatorAgent()
+    assert not evaluator.evaluate_context("\n".join([VECTOR_HITS, WEB_EMPTY]))
+    assert not evaluator.evaluate_context("\n".join(["Vector Store Results:\nNo results found.", PUBMED_HITS]))
+    assert not evaluator.evaluate_context("\n".join(["Vector Store Results:", PUBMED_HITS]))
+
+def test_early_exit_answers_are_not_cached(orchestrator, monkeypatch):
+    monkeypatch.setattr(central_agent, "EARLY_TERMINATION", True)
+    monkeypatch.setattr(central_agent, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(EvaluatorAgent, "evaluate_context", lambda self, context: True)
+    agent = CentralAgent(orchestrator)
+    events = list(agent.stream_query("amyloid beta"))
+    assert events[-1]["early_exit"] is True
+    assert agent.semantic_cache.entries == []
+
+def test_evaluator_verdict_is_recorded_when_early_termination_is_off(orchestrator, monkeypatch):
+    monkeypatch.setattr(central_agent, "EARLY_TERMINATION", False)
+    monkeypatch.setattr(EvaluatorAgent, "evaluate_context", lambda self, context: True)
+    candidates = counter_value("chatbot_early_exit_candidates_total")
+    potential = METRICS.histograms.get("chatbot_early_exit_potential_seconds", {}).get((), [0])[-1]
+    events = list(CentralAgent(orchestrator).stream_query("amyloid beta"))
+    # Every tool still ran, but the possible early exit shows up in the metrics
+    assert [event["event"] for event in events].count("tool_result") == 3
+    assert events[-1]["early_exit"] is False
+    assert counter_value("chatbot_early_exit_candidates_total") == candidates + 1
+    assert METRICS.histograms["chatbot_early_exit_potential_seconds"][()][-1] == potential + 1
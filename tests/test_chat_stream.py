@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from chatbot_v3.app import server
+from chatbot_v3.src.central_agent import CentralAgent
+from chatbot_v3.src.conversation_store import ConversationStore
+
+def read_events(response) -> list:
+    # Parse a text/event-stream body into (event, data) pairs
+    events = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+@pytest.fixture
+def client(orchestrator, monkeypatch):
+    monkeypatch.setattr(server, "central_agent", CentralAgent(orchestrator))
+    monkeypatch.setattr(server, "conversation_store", ConversationStore())
+    return server.app.test_client()
+
+def test_stream_sends_a_result_per_tool_then_the_final_answer(client):
+    response = client.post("/chat/stream", json={"query": "amyloid beta", "session_id": "stream-session"})
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    events = read_events(response)
+    names = [name for name, _ in events]
+    assert names == ["tool_result"] * 3 + ["final"]
+    assert sorted(data["tool"] for _, data in events[:3]) == ["PubMed", "VectorStore", "WebSearch"]
+    for _, data in events[:3]:
+        assert {"contents", "sources", "status", "elapsed"} <= set(data)
+    final = events[-1][1]
+    assert final["response"]
+    assert final["session_id"] == "stream-session"
+    assert final["turn"]["query"] == "amyloid beta"
+    assert "stream-session" in response.headers["Set-Cookie"]
+    # The answer is recorded in the session's history like a /chat answer
+    turns, _ = server.conversation_store.get_history("stream-session")
+    assert [turn["query"] for turn in turns] == ["amyloid beta"]
+
+def test_stream_reports_a_failure_as_an_error_event(client, monkeypatch):
+    def broken(query, timings=None):
+        yield {"event": "tool_result", "tool": "VectorStore", "contents": [], "sources": [], "status": "ok", "elapsed": 0.0}
+        raise RuntimeError("agent crashed")
+    monkeypatch.setattr(server.central_agent, "stream_query", broken)
+    events = read_events(client.post("/chat/stream", json={"query": "amyloid beta"}))
+    assert [name for name, _ in events] == ["tool_result", "error"]
+    assert "agent crashed" in events[-1][1]["error"]
+
+def test_stream_requires_a_query(client):
+    assert client.post("/chat/stream", json={}).status_code == 400
@@ -0,0 +1,56 @@
+from chatbot_v3.src.context_aggregator import ContextAggregator, estimate_tokens
+
+# Fixed embeddings keep similarities exact: "q" is the query direction
+VECTORS = {
+    "q": [1.0, 0.0, 0.0],
+    "best": [0.9, 0.1, 0.0],
+    "best again": [0.9, 0.1, 0.001],  # near-duplicate of "best"
+    "good": [0.7, 0.7, 0.0],
+    "weak": [0.1, 0.0, 1.0],
+}
+
+def embed(texts):
+    return [VECTORS[text.split(" #")[0]] for text in texts]
+
+def result(tool: str, *texts: str, status: str = "ok", source: str = None) -> dict:
+    return {"tool": tool, "status": status, "passages": [{"text": text, "source": source or f"{tool}:{text}"} for text in texts]}
+
+def test_near_duplicates_are_dropped_in_favour_of_the_better_ranked_passage():
+    aggregated = ContextAggregator(embed, token_budget=1000).aggregate("q", [result("PubMed", "weak", "best again"), result("WebSearch", "best")])
+    assert [passage["text"] for passage in aggregated["passages"]] == ["best", "weak"]
+    assert aggregated["stats"]["duplicates"] == 1
+
+def test_passages_are_ranked_by_similarity_to_the_query():
+    aggregated = ContextAggregator(embed, token_budget=1000).aggregate("q", [result("VectorStore", "weak", "good", "best")])
+    assert [passage["text"] for passage in aggregated["passages"]] == ["best", "good", "weak"]
+    scores = [passage["score"] for passage in aggregated["passages"]]
+    assert scores == sorted(scores, reverse=True)
+
+def test_packing_skips_passages_over_the_budget_but_keeps_smaller_ones():
+    long_good = "good #" + "x" * 400
+    budget = estimate_tokens("best") + estimate_tokens("weak") + 5
+    aggregated = ContextAggregator(embed, token_budget=budget).aggregate("q", [result("VectorStore", "best", long_good, "weak")])
+    assert [passage["text"] for passage in aggregated["passages"]] == ["best", "weak"]
+    assert aggregated["stats"]["over_budget"] == 1
+    assert aggregated["stats"]["tokens"] <= budget
+
+def test_context_is_grouped_by_tool_and_sources_are_deduplicated():
+    aggregated = ContextAggregator(embed, token_budget=1000).aggregate("q", [
+        result("VectorStore", "weak", source="notes.pdf"),
+        result("PubMed", "best", "good", source="12345"),
+        result("WebSearch", "best again", status="error"),
+    ])
+    assert aggregated["context"] == "Vector Store Results:\nweak\nPubMed Results:\nbest\n\ngood"
+    assert aggregated["sources"] == ["12345", "notes.pdf"]
+    assert aggregated["stats"]["candidates"] == 3
+
+def test_no_usable_passages_gives_an_empty_context():
+    aggregated = ContextAggregator(embed).aggregate("q", [result("PubMed", "best", status="timeout"), result("WebSearch", "  ")])
+    assert aggregated == {"context": "", "passages": [], "sources": [], "stats": {"candidates": 0, "duplicates": 0, "over_budget": 0}}
+
+def test_embedding_failure_falls_back_to_exact_deduplication():
+    def broken(texts):
+        raise RuntimeError("model unavailable")
+    aggregated = ContextAggregator(broken, token_budget=1000).aggregate("q", [result("PubMed", "best", "good"), result("WebSearch", "best")])
+    assert [passage["text"] for passage in aggregated["passages"]] == ["best", "good"]
+    assert aggregated["stats"]["duplicates"] == 1
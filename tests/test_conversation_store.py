@@ -0,0 +1,41 @@
+import pytest
+
+from chatbot_v3.src.conversation_store import ConversationStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    path = str(tmp_path / "conversations.sqlite3") if request.param == "sqlite" else None
+    return ConversationStore(max_turns=5, idle_ttl=3600, max_sessions=10, path=path)
+
+def test_history_is_paged_newest_first(store):
+    for index in range(5):
+        store.add_turn("session", f"query {index}", f"response {index}")
+    turns, cursor = store.get_history("session", limit=2)
+    assert [turn["query"] for turn in turns] == ["query 4", "query 3"]
+    turns, cursor = store.get_history("session", limit=2, before=cursor)
+    assert [turn["query"] for turn in turns] == ["query 2", "query 1"]
+    turns, cursor = store.get_history("session", limit=2, before=cursor)
+    assert [turn["query"] for turn in turns] == ["query 0"]
+    assert cursor is None
+
+def test_exact_last_page_has_no_cursor(store):
+    for index in range(4):
+        store.add_turn("session", f"query {index}", "response")
+    turns, cursor = store.get_history("session", limit=4)
+    assert len(turns) == 4
+    assert cursor is None
+
+def test_oldest_turns_are_dropped_beyond_the_cap(store):
+    for index in range(8):
+        store.add_turn("session", f"query {index}", "response")
+    turns, _ = store.get_history("session", limit=10)
+    assert [turn["query"] for turn in turns] == [f"query {index}" for index in reversed(range(3, 8))]
+    # Turn IDs keep increasing, so cursors stay valid as old turns are dropped
+    assert turns[0]["turn_id"] == 8
+
+def test_sessions_are_independent_and_can_be_cleared(store):
+    store.add_turn("a", "query a", "response a")
+    store.add_turn("b", "query b", "response b")
+    store.clear("a")
+    assert store.get_history("a") == ([], None)
+    assert [turn["query"] for turn in store.get_history("b")[0]] == ["query b"]
@@ -0,0 +1,67 @@
+import pytest
+
+from chatbot_v3.src.document_catalog import DocumentCatalog
+
+def make_catalog(count: int, ingested_at: float = None) -> DocumentCatalog:
+    catalog = DocumentCatalog()
+    for index in range(count):
+        catalog.upsert(f"doc-{index:03d}", f"file-{index:03d}.pdf", chunk_count=index + 1, size_bytes=100,
+                       content_hash=f"hash-{index}", ingested_at=ingested_at or 1000.0 + index)
+    return catalog
+
+def page_through(catalog: DocumentCatalog, limit: int, **filters) -> list:
+    documents, cursor, pages = [], None, 0
+    while True:
+        page, cursor = catalog.list(limit=limit, cursor=cursor, **filters)
+        documents += page
+        pages += 1
+        if cursor is None:
+            return documents
+        assert pages < 100
+
+def test_pages_cover_every_document_newest_first():
+    catalog = make_catalog(23)
+    documents = page_through(catalog, limit=5)
+    assert [document["doc_id"] for document in documents] == [f"doc-{index:03d}" for index in reversed(range(23))]
+
+def test_cursor_breaks_ties_on_ingest_time():
+    # Documents ingested in the same instant are still paged without gaps or repeats
+    catalog = make_catalog(12, ingested_at=5000.0)
+    documents = page_through(catalog, limit=5)
+    assert sorted(document["doc_id"] for document in documents) == [f"doc-{index:03d}" for index in range(12)]
+    assert len(documents) == 12
+
+def test_last_page_has_no_cursor():
+    catalog = make_catalog(4)
+    documents, cursor = catalog.list(limit=4)
+    assert len(documents) == 4
+    assert cursor is None
+
+def test_malformed_cursor_raises_value_error():
+    with pytest.raises(ValueError):
+        make_catalog(2).list(cursor="not-a-cursor")
+
+def test_filters():
+    catalog = make_catalog(10)
+    assert [document["doc_id"] for document in catalog.list(name="file-00")[0]] == [f"doc-{index:03d}" for index in reversed(range(10))]
+    assert [document["doc_id"] for document in catalog.list(content_hash="hash-3")[0]] == ["doc-003"]
+    assert len(catalog.list(since=1007.0)[0]) == 3
+    # LIKE wildcards in the name filter match literally
+    assert catalog.list(name="file_%")[0] == []
+
+def test_stats_follow_upserts_deletes_and_chunk_removal():
+    catalog = make_catalog(3)
+    assert catalog.get_stats() == {"document_count": 3, "chunk_count": 6, "total_bytes": 300, "last_ingested_at": 1002.0}
+    catalog.upsert("doc-000", "file-000.pdf", chunk_count=10, size_bytes=50, ingested_at=2000.0)
+    assert catalog.get_stats() == {"document_count": 3, "chunk_count": 15, "total_bytes": 250, "last_ingested_at": 2000.0}
+    catalog.remove_chunks("doc-001", 2)
+    assert catalog.get("doc-001") is None
+    assert catalog.delete("doc-002") is True
+    assert catalog.delete("doc-002") is False
+    assert catalog.get_stats()["document_count"] == 1
+    assert catalog.get_stats()["chunk_count"] == 10
+
+def test_find_by_hash():
+    catalog = make_catalog(3)
+    assert catalog.find_by_hash("hash-2")["name"] == "file-002.pdf"
+    assert catalog.find_by_hash("missing") is None
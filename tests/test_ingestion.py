@@ -0,0 +1,59 @@
+import time
+import threading
+
+import pytest
+
+from fake_services import HashingEmbeddingFunction
+from chatbot_v3.src import tool_orchestrator
+
+class SlowEmbeddingFunction(HashingEmbeddingFunction):
+    # Embeds like HashingEmbeddingFunction but slowly enough for uploads to overlap
+    fail_on_call = None
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def __call__(self, input):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("embedding backend down")
+        time.sleep(0.02)
+        return super().__call__(input)
+
+@pytest.fixture
+def orchestrator(monkeypatch):
+    monkeypatch.setattr(tool_orchestrator, "EMBED_BATCH_SIZE", 2)
+    return tool_orchestrator.ToolOrchestrator(embedding_function=SlowEmbeddingFunction())
+
+def write_document(path, word: str, paragraphs: int) -> str:
+    path.write_text("\n\n".join(f"{word} paragraph {index}. " * 40 for index in range(paragraphs)))
+    return str(path)
+
+def stored_chunks(orchestrator, source: str) -> list:
+    return orchestrator.collection.get(where={"source": source}, include=["metadatas"])["metadatas"]
+
+def test_failed_re_upload_keeps_the_previous_version(orchestrator, tmp_path):
+    first = orchestrator.ingest_document(write_document(tmp_path / "v1.txt", "alpha", 6), "report.txt")
+    orchestrator.embedding_function.fail_on_call = orchestrator.embedding_function.calls + 2
+    with pytest.raises(RuntimeError):
+        orchestrator.ingest_document(write_document(tmp_path / "v2.txt", "beta", 6), "report.txt")
+    chunks = stored_chunks(orchestrator, "report.txt")
+    assert len(chunks) == first["chunks"]
+    assert len({chunk["generation"] for chunk in chunks}) == 1
+    assert orchestrator.catalog.get(tool_orchestrator.source_key("report.txt"))["chunk_count"] == first["chunks"]
+
+def test_concurrent_uploads_of_one_source_leave_a_single_version(orchestrator, tmp_path):
+    paths = [write_document(tmp_path / "a.txt", "alpha", 12), write_document(tmp_path / "b.txt", "beta", 4)]
+    threads = [threading.Thread(target=orchestrator.ingest_document, args=(path, "shared.txt")) for path in paths]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+    chunks = stored_chunks(orchestrator, "shared.txt")
+    # Only the upload that finished last is left, complete, and the catalogue agrees
+    assert len({chunk["generation"] for chunk in chunks}) == 1
+    assert sorted(chunk["chunk_index"] for chunk in chunks) == list(range(len(chunks)))
+    assert orchestrator.catalog.get(tool_orchestrator.source_key("shared.txt"))["chunk_count"] == len(chunks)
+    assert len([hit for hit in orchestrator.lexical_index.search("alpha beta", k=1000) if hit[2] == "shared.txt"]) == len(chunks)
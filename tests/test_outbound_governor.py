@@ -0,0 +1,131 @@
+import time
+import threading
+
+import pytest
+import requests
+
+from chatbot_v3.src.outbound_governor import (TokenBucket, CircuitBreaker, SingleFlight, OutboundGovernor,
+                                              CircuitOpenError, RateLimitTimeout)
+
+def test_shared_bucket_is_used_again_after_a_sqlite_error(tmp_path):
+    bucket = TokenBucket("test", rate=1000, capacity=5, path=str(tmp_path / "rate_limits.sqlite3"))
+    database = bucket.db
+    database.execute("DROP TABLE rate_limits")
+    # The failing call is limited per process instead of failing or waiting
+    assert bucket.acquire(max_wait=1) < 1
+    assert bucket.db is database
+    database.execute("CREATE TABLE rate_limits (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+    bucket.acquire(max_wait=1)
+    assert database.execute("SELECT name FROM rate_limits").fetchall() == [("test",)]
+
+def test_buckets_sharing_a_file_share_the_budget(tmp_path):
+    path = str(tmp_path / "rate_limits.sqlite3")
+    first = TokenBucket("shared", rate=0.001, capacity=2, path=path)
+    second = TokenBucket("shared", rate=0.001, capacity=2, path=path)
+    assert first._try_take() == 0.0
+    assert second._try_take() == 0.0
+    assert first._try_take() > 0
+
+def failing_calls(breaker: CircuitBreaker, count: int) -> None:
+    for _ in range(count):
+        breaker.before_call()
+        breaker.record_failure(requests.exceptions.ConnectionError("refused"))
+
+def test_circuit_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("opens", failure_threshold=3, reset_timeout=60)
+    failing_calls(breaker, 2)
+    breaker.before_call()
+    breaker.record_success()  # a success resets the count
+    failing_calls(breaker, 2)
+    assert breaker.state == "closed"
+    failing_calls(breaker, 1)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_half_open_circuit_lets_a_single_trial_through():
+    breaker = CircuitBreaker("trial", failure_threshold=1, reset_timeout=0.05)
+    failing_calls(breaker, 1)
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker("reopens", failure_threshold=1, reset_timeout=0.05)
+    failing_calls(breaker, 1)
+    time.sleep(0.06)
+    failing_calls(breaker, 1)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_rate_limit_timeout_releases_the_trial_slot():
+    governor = OutboundGovernor("released", rate=0.001, path=None)
+    governor.breaker.failure_threshold, governor.breaker.reset_timeout = 1, 0.05
+    governor.limiter.acquire()  # use up the only token for the next 1000s
+    failing_calls(governor.breaker, 1)
+    time.sleep(0.06)
+    with pytest.raises(RateLimitTimeout):
+        governor.call("key", lambda: "never called")
+    # The trial never reached the backend, so the next caller may still make it
+    assert governor.breaker.trial_in_flight is False
+    governor.breaker.before_call()
+
+def test_errors_that_are_not_backend_failures_keep_the_circuit_closed():
+    governor = OutboundGovernor("parse", rate=0, path=None)
+    governor.breaker.failure_threshold = 1
+
+    def unparseable():
+        raise ValueError("bad XML")
+    with pytest.raises(ValueError):
+        governor.call("key", unparseable)
+    assert governor.breaker.state == "closed"
+
+def run_concurrently(single_flight: SingleFlight, fn, callers: int = 5) -> list:
+    # Call single_flight.do from several threads at once and collect results or exceptions
+    outcomes = []
+
+    def call():
+        try:
+            outcomes.append(single_flight.do("key", fn))
+        except Exception as e:
+            outcomes.append(e)
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+def test_concurrent_callers_share_one_upstream_call():
+    single_flight = SingleFlight("shared")
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(0.2)  # long enough for every caller to arrive while it is in flight
+        return {"count": 42}
+    outcomes = run_concurrently(single_flight, upstream)
+    assert len(calls) == 1
+    assert outcomes == [{"count": 42}] * 5
+    # Once the call is done the next caller starts a new one
+    single_flight.do("key", upstream)
+    assert len(calls) == 2
+
+def test_upstream_error_reaches_every_caller():
+    single_flight = SingleFlight("errors")
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(0.2)
+        raise requests.exceptions.ConnectionError("refused")
+    outcomes = run_concurrently(single_flight, upstream)
+    assert len(calls) == 1
+    assert len(outcomes) == 5
+    assert all(isinstance(outcome, requests.exceptions.ConnectionError) for outcome in outcomes)
@@ -0,0 +1,68 @@
+from fake_services import FakeServices
+
+def test_fetch_pubmed_articles_parses_every_article(orchestrator):
+    articles = orchestrator.fetch_pubmed_articles(["30000001", "30000002", "30000003"])
+    assert sorted(articles) == ["30000001", "30000002", "30000003"]
+    for article in articles.values():
+        assert article["title"] and article["abstract"]
+        assert "error" not in article
+
+def test_fetch_pubmed_articles_uses_one_efetch_call(orchestrator, fake_services):
+    orchestrator.fetch_pubmed_articles(["30000001", "30000002", "30000003", "30000004"])
+    assert fake_services.stats["efetch"] == 1
+
+def test_fetch_pubmed_articles_empty_list_makes_no_call(orchestrator, fake_services):
+    assert orchestrator.fetch_pubmed_articles([]) == {}
+    assert fake_services.stats["efetch"] == 0
+
+class MissingArticleServices(FakeServices):
+    # efetch silently leaves out one of the requested PMIDs, as NCBI does for withdrawn records
+    missing = "30000002"
+
+    def render_efetch(self, params):
+        ids = [pubmed_id for pubmed_id in params.get("id", "").split(",") if pubmed_id != self.missing]
+        return super().render_efetch(dict(params, id=",".join(ids)))
+
+def test_missing_pmid_is_left_out_and_reported(orchestrator, monkeypatch):
+    from chatbot_v3.src import tool_orchestrator
+    with MissingArticleServices() as services:
+        monkeypatch.setattr(tool_orchestrator, "EUTILS_BASE_URL", services.eutils_base_url)
+        articles = orchestrator.fetch_pubmed_articles(["30000001", "30000002", "30000003"])
+        assert sorted(articles) == ["30000001", "30000003"]
+
+        monkeypatch.setattr(orchestrator, "search_pubmed_ids", lambda query: ["30000001", "30000002", "30000003"])
+        result = orchestrator.query_pubmed("tau protein")
+    assert result.get("status", "ok") == "ok"
+    assert "Error fetching details for ID 30000002" in result["contents"][0]
+    assert [passage["source"] for passage in result["passages"]] == ["30000001", "30000003"]
+    # Only the articles that were returned are cached
+    assert orchestrator.pubmed_article_cache.get("30000002") is None
+    assert orchestrator.pubmed_article_cache.get("30000001") is not None
+
+def test_article_that_fails_to_parse_is_attributed_to_its_pmid(orchestrator, monkeypatch):
+    good = {"MedlineCitation": {"PMID": "30000001", "Article": {"ArticleTitle": "Title", "Abstract": {"AbstractText": ["Abstract"]}}}}
+    # A record that is not a mapping makes the per-article parser raise
+    monkeypatch.setattr(orchestrator, "_call_eutils", lambda utility, **params: {"PubmedArticle": [good, "malformed record"]})
+    articles = orchestrator.fetch_pubmed_articles(["30000001", "30000002"])
+    assert articles["30000001"] == {"title": "Title", "abstract": "Abstract"}
+    assert "AttributeError" in articles["30000002"]["error"]
+
+def test_article_without_abstract_gets_placeholder(orchestrator, monkeypatch):
+    record = {"MedlineCitation": {"PMID": "30000001", "Article": {"ArticleTitle": "Title"}}}
+    monkeypatch.setattr(orchestrator, "_call_eutils", lambda utility, **params: {"PubmedArticle": [record]})
+    assert orchestrator.fetch_pubmed_articles(["30000001"])["30000001"]["abstract"] == "No Abstract Available"
+
+def test_failed_efetch_marks_every_article_as_an_error(orchestrator, monkeypatch):
+    from chatbot_v3.src import tool_orchestrator
+    with FakeServices(error_rate=1.0) as services:
+        monkeypatch.setattr(tool_orchestrator, "EUTILS_BASE_URL", services.eutils_base_url)
+        articles = orchestrator.fetch_pubmed_articles(["30000001", "30000002"])
+    assert sorted(articles) == ["30000001", "30000002"]
+    assert all("HTTPError" in article["error"] for article in articles.values())
+
+def test_query_pubmed_reuses_cached_articles(orchestrator, fake_services):
+    first = orchestrator.query_pubmed("amyloid beta")
+    second = orchestrator.query_pubmed("amyloid beta")
+    assert first["contents"] == second["contents"]
+    assert fake_services.stats["esearch"] == 1
+    assert fake_services.stats["efetch"] == 1
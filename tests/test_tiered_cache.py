@@ -0,0 +1,58 @@
+import time
+
+from chatbot_v3.src.tool_orchestrator import TieredCache
+
+def test_set_and_get_round_trip():
+    cache = TieredCache("roundtrip", ttl=60)
+    cache.set("key", {"title": "Title", "ids": [1, 2]})
+    assert cache.get("key") == {"title": "Title", "ids": [1, 2]}
+    assert cache.get("other") is None
+    assert cache.get_stats()["memory_hits"] == 1
+    assert cache.get_stats()["misses"] == 1
+
+def test_get_many_returns_only_cached_keys():
+    cache = TieredCache("many", ttl=60)
+    cache.set_many({"a": 1, "b": 2})
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "b": 2}
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache = TieredCache("expiry", ttl=10)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.set("key", "value")
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("key") is None
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = TieredCache("lru", ttl=60, memory_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # a is now more recently used than b
+    cache.set("c", 3)
+    assert list(cache.memory) == ["a", "c"]
+    assert cache.get_stats()["evictions"] == 1
+
+def test_disk_tier_serves_entries_evicted_from_memory(tmp_path):
+    cache = TieredCache("tiers", ttl=60, memory_entries=1, path=str(tmp_path / "cache.sqlite3"))
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert "a" not in cache.memory
+    assert cache.get("a") == 1
+    assert cache.get_stats()["disk_hits"] == 1
+    # The disk hit is promoted back into memory
+    assert "a" in cache.memory
+
+def test_disk_tier_is_shared_and_survives_restarts(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    TieredCache("shared", ttl=60, path=path).set("key", [1, 2, 3])
+    assert TieredCache("shared", ttl=60, path=path).get("key") == [1, 2, 3]
+
+def test_disk_tier_evicts_least_recently_used_rows(tmp_path):
+    cache = TieredCache("bounded", ttl=60, memory_entries=10, disk_entries=2, path=str(tmp_path / "cache.sqlite3"))
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+        time.sleep(0.01)
+    assert cache.get_stats()["disk_size"] == 2
+    reopened = TieredCache("bounded", ttl=60, path=str(tmp_path / "cache.sqlite3"))
+    assert reopened.get("a") is None
+    assert reopened.get("c") == "c"
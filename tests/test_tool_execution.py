@@ -0,0 +1,67 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from chatbot_v3.src import tool_orchestrator
+
+@pytest.fixture
+def slow_tools(monkeypatch):
+    # Registers tools that sleep for the given number of seconds (or until the test ends)
+    # and runs them on a fresh pool with a single worker
+    released = threading.Event()
+
+    def register(**durations):
+        for name, seconds in durations.items():
+            def factory(orchestrator, seconds=seconds):
+                def query(query):
+                    released.wait(seconds)
+                    return {"contents": [f"{query} after {seconds}s"], "sources": []}
+                return query
+            monkeypatch.setitem(tool_orchestrator.TOOL_FACTORIES, name, factory)
+
+    orchestrator = tool_orchestrator.ToolOrchestrator()
+    orchestrator.executor = ThreadPoolExecutor(max_workers=1)
+    yield orchestrator, register
+    released.set()
+    orchestrator.executor.shutdown(wait=True)
+
+def test_deadline_counts_from_when_a_queued_tool_starts(slow_tools):
+    orchestrator, register = slow_tools
+    register(Slow=3.0)
+    # Another request's tool holds the only pool thread for a second
+    orchestrator.executor.submit(time.sleep, 1.0)
+    start = time.monotonic()
+    results = orchestrator.run_tools(["Slow"], "q", timeouts={"Slow": 0.5})
+    elapsed = time.monotonic() - start
+    # Slow started after a second in the queue, then missed its 0.5s deadline
+    assert results["Slow"]["status"] == "timeout"
+    assert 1.4 < elapsed < 2.0
+
+def test_queued_tool_does_not_lose_its_timeout_to_the_queue(slow_tools):
+    orchestrator, register = slow_tools
+    register(Blocker=0.6, Quick=0.1)
+    results = orchestrator.run_tools(["Blocker", "Quick"], "q", timeouts={"Blocker": 5.0, "Quick": 0.5})
+    assert results["Quick"]["status"] == "ok"
+
+def test_tool_stuck_in_the_queue_times_out(slow_tools, monkeypatch):
+    orchestrator, register = slow_tools
+    monkeypatch.setattr(tool_orchestrator, "TOOL_QUEUE_TIMEOUT", 0.3)
+    register(Blocker=2.0, Quick=0.1)
+    start = time.monotonic()
+    results = orchestrator.run_tools(["Blocker", "Quick"], "q", timeouts={"Blocker": 0.5, "Quick": 5.0})
+    assert results["Quick"]["status"] == "timeout"
+    assert "0.3s" in results["Quick"]["contents"][0]
+    assert results["Blocker"]["status"] == "timeout"
+    assert time.monotonic() - start < 1.0
+
+def test_results_are_yielded_as_tools_finish(slow_tools):
+    orchestrator, register = slow_tools
+    orchestrator.executor = ThreadPoolExecutor(max_workers=3)
+    register(A=0.6, B=0.1, C=0.3)
+    start = time.monotonic()
+    order = [result["tool"] for result in orchestrator.iter_tool_results(["A", "B", "C"], "q")]
+    assert order == ["B", "C", "A"]
+    # The tools ran side by side, not one after another
+    assert time.monotonic() - start < 0.9
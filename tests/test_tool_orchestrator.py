@@ -0,0 +1,113 @@
+from conftest import counter_value
+from fake_services import HashingEmbeddingFunction
+from chatbot_v3.src import tool_orchestrator
+from chatbot_v3.src.bm25_index import BM25Index
+
+def test_backend_failures_are_reported_and_counted(orchestrator, fake_services):
+    # Tools catch their own backend errors; the failure must still reach the result status
+    # and the error counters rather than being recorded as an "ok" call
+    fake_services.error_rate = 1.0
+    tools = ["PubMed", "WebSearch"]
+    before = {tool: (counter_value("chatbot_tool_results_total", tool=tool, status="error"),
+                     counter_value("chatbot_stage_errors_total", stage="tool_call", tool=tool)) for tool in tools}
+    results = orchestrator.run_tools(tools, "amyloid beta")
+    for tool in tools:
+        assert results[tool]["status"] == "error"
+        assert counter_value("chatbot_tool_results_total", tool=tool, status="error") == before[tool][0] + 1
+        assert counter_value("chatbot_stage_errors_total", stage="tool_call", tool=tool) == before[tool][1] + 1
+
+def test_writers_sharing_a_vector_store_keep_each_others_lexical_index_changes():
+    # Two orchestrators on one VECTOR_STORE_PATH stand in for two worker processes, each
+    # with its own copy of the BM25 index loaded before the other one wrote
+    first = tool_orchestrator.ToolOrchestrator(embedding_function=HashingEmbeddingFunction())
+    second = tool_orchestrator.ToolOrchestrator(embedding_function=HashingEmbeddingFunction())
+    assert first.collection and second.collection
+    first.add_documents(["Zebrafish regenerate heart tissue."], ["writer-a"], [{"source": "writer-a.txt"}])
+    second.add_documents(["Axolotls regenerate limbs."], ["writer-b"], [{"source": "writer-b.txt"}])
+    saved = BM25Index.load(first.lexical_index_path)
+    assert sorted(doc_id for doc_id, _, _ in saved.search("zebrafish axolotls")) == ["writer-a", "writer-b"]
+    first.delete_document("writer-b")
+    assert [doc_id for doc_id, _, _ in BM25Index.load(first.lexical_index_path).search("zebrafish axolotls")] == ["writer-a"]
+    first.delete_document("writer-a")
+
+def test_add_documents_catalogues_sources_with_their_chunk_counts():
+    orchestrator = tool_orchestrator.ToolOrchestrator(embedding_function=HashingEmbeddingFunction())
+    before = orchestrator.get_vector_store_status()
+    texts = [f"Chunk {index} about synaptic plasticity." for index in range(5)]
+    ids = [f"bulk-{index}" for index in range(5)]
+    metadatas = [{"source": "bulk-a.txt"}] * 3 + [{"source": "bulk-b.txt"}] * 2
+    orchestrator.add_documents(texts, ids, metadatas)
+    # Upserting the same chunks again does not count them twice
+    orchestrator.add_documents(texts[:3], ids[:3], metadatas[:3])
+    status = orchestrator.get_vector_store_status()
+    assert status["document_count"] == before["document_count"] + 2
+    assert status["chunk_count"] == before["chunk_count"] + 5
+    names = {document["name"]: document["chunk_count"] for document in orchestrator.list_documents(name="bulk-")["documents"]}
+    assert names == {"bulk-a.txt": 3, "bulk-b.txt": 2}
+    for document in orchestrator.list_documents(name="bulk-")["documents"]:
+        assert orchestrator.delete_document(document["doc_id"])
+    assert orchestrator.get_vector_store_status()["chunk_count"] == before["chunk_count"]
+
+def test_chunks_without_a_source_can_be_deleted_through_the_catalogue():
+    orchestrator = tool_orchestrator.ToolOrchestrator(embedding_function=HashingEmbeddingFunction())
+    orchestrator.add_documents(["Lonely chunk about ependymal cells."], ["lonely-chunk"])
+    document = orchestrator.list_documents(name="lonely-chunk")["documents"][0]
+    assert document["chunk_count"] == 1
+    assert orchestrator.delete_document(document["doc_id"])
+    assert orchestrator.collection.get(ids=["lonely-chunk"])["ids"] == []
+    assert orchestrator.lexical_index.search("ependymal") == []
+
+def test_unsaved_lexical_changes_survive_a_reload_of_another_writers_save():
+    first = tool_orchestrator.ToolOrchestrator(embedding_function=HashingEmbeddingFunction())
+    second = tool_orchestrator.ToolOrchestrator(embedding_function=HashingEmbeddingFunction())
+    assert first.collection and second.collection
+    # second is mid-ingest: its change is in memory only when first saves
+    second._change_lexical_index("add", "pending-b", "Planarians regrow heads.", "pending-b.txt")
+    first.add_documents(["Hydra regrow tentacles."], ["saved-a"], [{"source": "saved-a.txt"}])
+    second.save_lexical_index()
+    saved = BM25Index.load(first.lexical_index_path)
+    assert sorted(doc_id for doc_id, _, _ in saved.search("planarians hydra")) == ["pending-b", "saved-a"]
+    second._change_lexical_index("delete", "pending-b")
+    second.delete_document("saved-a")
+
+def test_ingest_saves_the_lexical_index_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(tool_orchestrator, "EMBED_BATCH_SIZE", 2)
+    orchestrator = tool_orchestrator.ToolOrchestrator(embedding_function=HashingEmbeddingFunction())
+    assert orchestrator.collection
+    saves = []
+    monkeypatch.setattr(BM25Index, "save", lambda index, path: saves.append(path))
+    path = tmp_path / "notes.txt"
+    path.write_text("\n\n".join(f"Oligodendrocyte note {index}. " * 40 for index in range(6)))
+    stats = orchestrator.ingest_document(str(path), "notes.txt")
+    assert stats["batches"] > 1
+    assert len(saves) == 1
+
+def test_reads_reload_the_lexical_index_at_most_once_per_interval(monkeypatch):
+    reader = tool_orchestrator.ToolOrchestrator(embedding_function=HashingEmbeddingFunction())
+    writer = tool_orchestrator.ToolOrchestrator(embedding_function=HashingEmbeddingFunction())
+    assert reader.collection and writer.collection
+    loads = []
+    original_load = BM25Index.load
+    monkeypatch.setattr(BM25Index, "load", classmethod(lambda cls, path: loads.append(path) or original_load(path)))
+    reader.lexical_index_checked_at = 0.0
+    writer.add_documents(["Astrocytes buffer potassium."], ["throttle-a"], [{"source": "throttle-a.txt"}])
+    reader.retrieve("astrocytes potassium", 3, mode="lexical")
+    writer.add_documents(["Astrocytes release gliotransmitters."], ["throttle-b"], [{"source": "throttle-b.txt"}])
+    hits = reader.retrieve("astrocytes", 3, mode="lexical")
+    # The second write is only picked up after VECTOR_STORE_RELOAD_INTERVAL
+    assert len(loads) == 1
+    assert [hit["id"] for hit in hits] == ["throttle-a"]
+    for doc_id in ("throttle-a", "throttle-b"):
+        writer.delete_document(doc_id)
+
+def test_dense_mode_loads_the_lexical_index_only_when_needed(monkeypatch):
+    monkeypatch.setattr(tool_orchestrator, "RETRIEVAL_MODE", "dense")
+    orchestrator = tool_orchestrator.ToolOrchestrator(embedding_function=HashingEmbeddingFunction())
+    assert orchestrator.collection
+    assert orchestrator.retrieve("amyloid", 1)
+    assert not orchestrator.lexical_index_loaded
+    orchestrator.add_documents(["Pericytes regulate blood flow."], ["dense-a"], [{"source": "dense-a.txt"}])
+    assert orchestrator.lexical_index_loaded
+    # The writer started from the saved index, so saving did not drop earlier chunks
+    assert len(BM25Index.load(orchestrator.lexical_index_path)) == len(orchestrator.lexical_index)
+    orchestrator.delete_document("dense-a")